@@ -0,0 +1,252 @@
+import argparse
+import logging
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from haversine import haversine
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# rapidfuzz is much faster than difflib on large feeds, but optional
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    fuzz = None
+
+EARTH_RADIUS_M = 6371000
+
+# Tokens that mark different chargers at the same site; names differing in these
+# (or in unit numbers such as "AdPod 1" / "AdPod 2") are not merged
+DISTINGUISHING_TOKENS = {'ac', 'dc'}
+
+
+def normalize_text(value):
+    """
+    Lowercase, strip punctuation and collapse whitespace for fuzzy comparison.
+    """
+    if not isinstance(value, str):
+        return ''
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value.lower()).split())
+
+
+def similarity(a, b):
+    """
+    Similarity of two normalized strings in [0, 1].
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    if fuzz is not None:
+        return fuzz.token_sort_ratio(a, b) / 100.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def distinguishing_tokens(name):
+    """Tokens of a normalized name that mark a distinct charger, e.g. AC, DC or a number."""
+    return frozenset(token for token in name.split() if token in DISTINGUISHING_TOKENS or token.isdigit())
+
+
+def conflicting_names(a, b):
+    """
+    True when two normalized names carry different distinguishing tokens, e.g. AC vs DC.
+    """
+    tokens_a, tokens_b = distinguishing_tokens(a), distinguishing_tokens(b)
+    return bool(tokens_a and tokens_b and tokens_a != tokens_b)
+
+
+def basic_clean(df):
+    """
+    The cleaning steps from mian.ipynb: fill missing addresses, drop rows without
+    valid coordinates, drop exact duplicates and title-case state/city.
+    """
+    df = df.copy()
+    df['address'] = df['address'].fillna('Unknown Address')
+    df['lattitude'] = pd.to_numeric(df['lattitude'], errors='coerce')
+    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
+    df = df.dropna(subset=['lattitude', 'longitude'])
+    df = df[(df['lattitude'].between(-90, 90)) & (df['longitude'].between(-180, 180))]
+    df = df.drop_duplicates(subset=['name', 'lattitude', 'longitude'])
+    df['state'] = df['state'].str.title().str.strip()
+    df['city'] = df['city'].str.title().str.strip()
+    return df.reset_index(drop=True)
+
+
+def lat_band(lat, cell_m):
+    """Latitude band of height cell_m metres that each coordinate falls in."""
+    return np.floor(EARTH_RADIUS_M * np.radians(lat) / cell_m).astype(np.int64)
+
+
+def band_width_deg(band, cell_m):
+    """
+    Longitude width in degrees of the cells in a latitude band, measured at the band's
+    poleward edge so a cell is at least cell_m wide everywhere in the band.
+    """
+    band = np.asarray(band)
+    edge = np.maximum(np.abs(band), np.abs(band + 1)) * cell_m / EARTH_RADIUS_M
+    cos_edge = np.maximum(np.cos(np.minimum(edge, np.pi / 2)), 1e-9)
+    return np.minimum(np.degrees(cell_m / (EARTH_RADIUS_M * cos_edge)), 360.0)
+
+
+def spatial_cells(lat, lng, cell_m):
+    """
+    Hash coordinates into cells of at least cell_m by cell_m metres: latitude bands
+    of fixed height, each cut into longitude cells sized for that band.
+    Returns (x index within the band, band).
+    """
+    band = lat_band(lat, cell_m)
+    return np.floor(np.asarray(lng) / band_width_deg(band, cell_m)).astype(np.int64), band
+
+
+def neighbour_cells(cx, cy, cell_m):
+    """
+    The cell itself, its eastern neighbour and every cell of the next band within
+    cell_m of it. Band widths differ, so the next band's x range is computed from
+    longitudes; each pair of cells is visited once.
+    """
+    width = float(band_width_deg(cy, cell_m))
+    next_width = float(band_width_deg(cy + 1, cell_m))
+    pad = max(width, next_width)
+    lo = int(np.floor((cx * width - pad) / next_width))
+    hi = int(np.floor(((cx + 1) * width + pad) / next_width))
+    return [(cx, cy), (cx + 1, cy)] + [(x, cy + 1) for x in range(lo, hi + 1)]
+
+
+class _UnionFind:
+    """
+    Union-find over rows, each group carrying the distinguishing tokens of its
+    members (at most one non-empty set, since differing sets conflict).
+    """
+
+    def __init__(self, tokens):
+        self.parent = np.arange(len(tokens))
+        self.tokens = [token_set or None for token_set in tokens]
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        """Merge the groups of i and j unless their tokens conflict; returns whether they are joined."""
+        ri, rj = self.find(i), self.find(j)
+        if ri == rj:
+            return True
+        ti, tj = self.tokens[ri], self.tokens[rj]
+        if ti is not None and tj is not None and ti != tj:
+            return False
+        # Keep the lower row as the root so the earliest record wins ties
+        root, child = min(ri, rj), max(ri, rj)
+        self.parent[child] = root
+        self.tokens[root] = ti if ti is not None else tj
+        return True
+
+
+def find_duplicates(df, radius_m=150.0, name_threshold=0.85, address_threshold=0.9):
+    """
+    Candidate duplicate pairs: stations within radius_m of each other whose names or
+    addresses are fuzzy matches, unless the names mark different chargers. Only stations
+    in the same or an adjacent spatial cell are compared, so cost grows with local
+    density rather than with n^2.
+    Returns a list of (i, j, distance_m, name_similarity, address_similarity).
+    """
+    lat = df['lattitude'].to_numpy(dtype=float)
+    lng = df['longitude'].to_numpy(dtype=float)
+    names = [normalize_text(value) for value in df['name']]
+    addresses = [normalize_text(value) for value in df['address']]
+    cell_x, cell_y = spatial_cells(lat, lng, radius_m)
+
+    cells = {}
+    for i, key in enumerate(zip(cell_x.tolist(), cell_y.tolist())):
+        cells.setdefault(key, []).append(i)
+
+    pairs = []
+    for (cx, cy), members in cells.items():
+        for neighbour in neighbour_cells(cx, cy, radius_m):
+            others = cells.get(neighbour)
+            if not others:
+                continue
+            for a_pos, i in enumerate(members):
+                candidates = members[a_pos + 1:] if neighbour == (cx, cy) else others
+                if not candidates:
+                    continue
+                candidates = np.asarray(candidates)
+                distances = haversine(lat[i], lng[i], lat[candidates], lng[candidates]) * 1000
+                for j, distance in zip(candidates[distances <= radius_m].tolist(),
+                                       distances[distances <= radius_m].tolist()):
+                    if conflicting_names(names[i], names[j]):
+                        continue
+                    name_sim = similarity(names[i], names[j])
+                    address_sim = similarity(addresses[i], addresses[j])
+                    if name_sim >= name_threshold or address_sim >= address_threshold:
+                        pairs.append((i, j, distance, name_sim, address_sim))
+    return pairs
+
+
+def deduplicate(df, radius_m=150.0, name_threshold=0.85, address_threshold=0.9):
+    """
+    Clean the raw catalogue and merge fuzzy duplicates.
+    Returns (cleaned DataFrame, merge report DataFrame).
+    """
+    cleaned = basic_clean(df)
+    pairs = find_duplicates(cleaned, radius_m, name_threshold, address_threshold)
+
+    # Merging is transitive, so check tokens against whole groups; strongest matches go first
+    groups = _UnionFind([distinguishing_tokens(normalize_text(name)) for name in cleaned['name']])
+    refused = 0
+    for i, j, *_ in sorted(pairs, key=lambda pair: (-max(pair[3], pair[4]), pair[2])):
+        refused += not groups.union(i, j)
+    if refused:
+        logging.info(f"Refused {refused} merges that would join differently marked chargers")
+    roots = np.array([groups.find(i) for i in range(len(cleaned))], dtype=np.int64)
+
+    # Within each group keep the record with the most detailed address
+    address_length = cleaned['address'].fillna('').str.len().to_numpy()
+    order = np.lexsort((np.arange(len(cleaned)), -address_length, roots))
+    keep_mask = np.r_[True, roots[order][1:] != roots[order][:-1]]
+    kept_for_root = dict(zip(roots[order][keep_mask].tolist(), order[keep_mask].tolist()))
+
+    pair_lookup = {(min(i, j), max(i, j)): (distance, name_sim, address_sim)
+                   for i, j, distance, name_sim, address_sim in pairs}
+    report = []
+    for i in np.flatnonzero(np.array([kept_for_root[root] for root in roots]) != np.arange(len(cleaned))):
+        kept = kept_for_root[roots[i]]
+        distance, name_sim, address_sim = pair_lookup.get((min(i, kept), max(i, kept)), (np.nan, np.nan, np.nan))
+        report.append({
+            'kept_name': cleaned.at[kept, 'name'],
+            'kept_address': cleaned.at[kept, 'address'],
+            'merged_name': cleaned.at[i, 'name'],
+            'merged_address': cleaned.at[i, 'address'],
+            'distance_m': round(distance, 1) if not np.isnan(distance) else None,
+            'name_similarity': round(name_sim, 3) if not np.isnan(name_sim) else None,
+            'address_similarity': round(address_sim, 3) if not np.isnan(address_sim) else None
+        })
+
+    result = cleaned.iloc[sorted(kept_for_root.values())].reset_index(drop=True)
+    logging.info(f"Cleaned {len(df)} rows to {len(cleaned)}, merged {len(report)} fuzzy duplicates, "
+                 f"{len(result)} stations remain")
+    return result, pd.DataFrame(report)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Clean and deduplicate a raw station catalogue")
+    parser.add_argument('input', nargs='?', default='ev-charging-stations-india.csv')
+    parser.add_argument('--output', default='cleaned_ev_charging_stations.csv')
+    parser.add_argument('--report', default='merge_report.csv')
+    parser.add_argument('--radius-m', type=float, default=150.0, help="Max distance between duplicates")
+    parser.add_argument('--name-threshold', type=float, default=0.85)
+    parser.add_argument('--address-threshold', type=float, default=0.9)
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.input)
+    cleaned, report = deduplicate(raw, args.radius_m, args.name_threshold, args.address_threshold)
+    cleaned.to_csv(args.output, index=False)
+    report.to_csv(args.report, index=False)
+    logging.info(f"Saved {args.output} and {args.report}")
@@ -17,4 +17,13 @@ def haversine(lat1, lon1, lat2, lon2):
     
     # Radius of Earth in kilometers
     r = 6371
-    return c * r
\ No newline at end of file
+    return c * r
+
+def haversine_radians(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great-circle distance (in kilometers) for coordinates already in radians.
+    """
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    return 2 * 6371 * np.arcsin(np.sqrt(a))
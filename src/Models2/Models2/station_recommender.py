@@ -1,6 +1,9 @@
 import pandas as pd
-from haversine import haversine
+import numpy as np
+from sklearn.neighbors import BallTree
+from haversine import haversine_radians
 import pickle
+import hashlib
 import os
 import logging
 
@@ -8,12 +11,13 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class ChargingStationRecommender:
-    def __init__(self, data_path='balanced_dataset.csv'):
+    def __init__(self, data_path='balanced_dataset.csv', df=None):
         """
-        Initialize the recommender with station data from a CSV file.
+        Initialize the recommender with station data from a CSV file, or from an
+        already loaded DataFrame (e.g. one partition of the catalogue).
         """
         try:
-            self.df = pd.read_csv(data_path)
+            self.df = pd.read_csv(data_path) if df is None else df.reset_index(drop=True)
             logging.info(f"Loaded dataset with shape: {self.df.shape}")
             logging.info(f"Dataset columns: {self.df.columns.tolist()}")
         except FileNotFoundError:
@@ -41,28 +45,117 @@ class ChargingStationRecommender:
             if (self.df[slot] > self.df['Total_Slots']).any():
                 logging.warning(f"{slot} exceeds Total_Slots in some rows")
 
-    def find_nearest(self, user_lat, user_lon, n=6):
+    def find_nearest(self, user_lat, user_lon, n=6, rows=None):
         """
         Find the nearest n stations to the given latitude and longitude.
+        `rows` optionally restricts the search to those row positions.
         Returns a DataFrame with all relevant station details and distances.
         """
         if not (-90 <= user_lat <= 90) or not (-180 <= user_lon <= 180):
             raise ValueError("Invalid latitude or longitude values")
         
         try:
-            self.df['distance'] = self.df.apply(
-                lambda row: haversine(user_lat, user_lon, row['lattitude'], row['longitude']),
-                axis=1
-            )
-            nearest_stations = self.df.sort_values('distance').head(n).copy()
-            logging.info(f"Found {len(nearest_stations)} nearest stations for lat={user_lat}, lng={user_lon}")
-            # Log all columns safely
-            logging.info(f"Nearest stations data sample:\n{nearest_stations.to_string()}")
+            lat_rad, lon_rad = self._coordinates()
+            if rows is None:
+                rows = np.arange(len(lat_rad))
+            rows = np.asarray(rows, dtype=np.int64)
+            distances = haversine_radians(np.radians(user_lat), np.radians(user_lon), lat_rad[rows], lon_rad[rows])
+            n = min(n, len(distances))
+            # Partial sort: only the n closest stations need ordering
+            closest = np.argpartition(distances, n - 1)[:n] if n > 0 else np.empty(0, dtype=int)
+            closest = closest[np.argsort(distances[closest], kind='stable')]
+            nearest = rows[closest]
+            nearest_stations = self.df.iloc[nearest].copy()
+            nearest_stations['distance'] = distances[closest]
+            nearest_stations['station_id'] = self.station_ids()[nearest]
+            logging.debug(f"Found {len(nearest_stations)} nearest stations for lat={user_lat}, lng={user_lon}")
             return nearest_stations
         except Exception as e:
             logging.error(f"Error in find_nearest: {str(e)}")
             raise
 
+    def _coordinates(self):
+        """
+        Station coordinates in radians, cached on first use.
+        Pickled instances only carry the DataFrame, so the cache is rebuilt lazily.
+        """
+        if getattr(self, '_coords_rad', None) is None:
+            self._coords_rad = (
+                np.radians(self.df['lattitude'].to_numpy(dtype=float)),
+                np.radians(self.df['longitude'].to_numpy(dtype=float))
+            )
+        return self._coords_rad
+
+    def station_ids(self):
+        """
+        Stable station IDs derived from name and rounded coordinates, so the same
+        station keeps its ID across restarts and clients can cache by it.
+        Exact duplicates get a numeric suffix in catalogue order.
+        """
+        if getattr(self, '_station_ids', None) is None:
+            seen = {}
+            ids = []
+            for name, lat, lng in zip(self.df['name'], self.df['lattitude'], self.df['longitude']):
+                key = f"{str(name).strip().lower()}|{float(lat):.5f}|{float(lng):.5f}"
+                station_id = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+                count = seen.get(station_id, 0)
+                seen[station_id] = count + 1
+                ids.append(station_id if count == 0 else f"{station_id}-{count}")
+            self._station_ids = np.array(ids, dtype=object)
+        return self._station_ids
+
+    def station_row(self, station_id):
+        """
+        Row position of a station ID, or None if it is not in the catalogue.
+        """
+        if getattr(self, '_row_by_id', None) is None:
+            self._row_by_id = {station_id: i for i, station_id in enumerate(self.station_ids())}
+        return self._row_by_id.get(station_id)
+
+    def build_neighbour_graph(self, k=8):
+        """
+        Precompute each station's k nearest other stations as a CSR graph:
+        neighbours of row i are indices[indptr[i]:indptr[i + 1]], closest first,
+        with distances (km) in the matching positions of distances.
+        Queries a haversine BallTree, so the build is O(n log n) rather than all pairs.
+        """
+        lat_rad, lon_rad = self._coordinates()
+        n = len(lat_rad)
+        k = min(k, max(n - 1, 0))
+        indices = np.empty((n, k), dtype=np.int32)
+        distances = np.empty((n, k), dtype=np.float32)
+        if k > 0:
+            points = np.column_stack([lat_rad, lon_rad])
+            # One extra neighbour, since a station is usually (not always, with exact duplicates) its own nearest
+            found_dist, found = BallTree(points, metric='haversine').query(points, k=k + 1)
+            not_self = found != np.arange(n)[:, None]
+            # Keep the first k entries that are not the station itself, in distance order
+            keep = not_self & (np.cumsum(not_self, axis=1) <= k)
+            indices[:] = found[keep].reshape(n, k)
+            distances[:] = (found_dist[keep] * 6371).reshape(n, k)
+        self._neighbour_graph = (
+            np.arange(0, n * k + 1, k, dtype=np.int32) if k > 0 else np.zeros(n + 1, dtype=np.int32),
+            indices.reshape(-1),
+            distances.reshape(-1)
+        )
+        logging.info(f"Built {k}-nearest neighbour graph for {n} stations")
+        return self._neighbour_graph
+
+    def neighbours(self, row):
+        """
+        (rows, distances_km) of the precomputed nearest neighbours of a station row.
+        """
+        if getattr(self, '_neighbour_graph', None) is None:
+            self.build_neighbour_graph()
+        indptr, indices, distances = self._neighbour_graph
+        return indices[indptr[row]:indptr[row + 1]], distances[indptr[row]:indptr[row + 1]]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for cached in ('_coords_rad', '_station_ids', '_row_by_id', '_neighbour_graph'):
+            state.pop(cached, None)
+        return state
+
 def save_model(dataset_path="balanced_dataset.csv"):
     """
     Create and save the ChargingStationRecommender model to CS_rec.pkl.
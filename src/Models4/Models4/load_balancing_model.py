@@ -6,20 +6,40 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.impute import SimpleImputer
 from sklearn.metrics import classification_report, roc_auc_score
 from imblearn.over_sampling import SMOTE
+import xgboost as xgb
 import pickle
 import os
+import tempfile
+import shutil
+import argparse
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SLOTS = ['6AM-11AM', '11AM-4PM', '4PM-10PM']
+
+# Column order produced by preprocess_data + get_dummies in train_model
+FEATURE_NAMES = [
+    '6AM-11AM_Booked_slots', 'Total_Slots', 'booking_ratio', '11AM-4PM_Booked_slots',
+    '4PM-10PM_Booked_slots', 'time_slot_11AM-4PM', 'time_slot_4PM-10PM', 'time_slot_6AM-11AM'
+]
+
+# Histogram cut points for the drift monitor's reference profile (see src/monitoring.py)
+PROFILE_CUTS = {
+    'booking_ratio': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0],
+    'total_slots': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 15, 20, 30, 50]
+}
+
 # Load data
-try:
-    data = pd.read_csv("balanced_dataset.csv")
-    logging.info(f"Loaded dataset with shape: {data.shape}")
-except FileNotFoundError:
-    logging.error("balanced_dataset.csv not found")
-    raise
+def load_data(data_path="balanced_dataset.csv"):
+    try:
+        data = pd.read_csv(data_path)
+        logging.info(f"Loaded dataset with shape: {data.shape}")
+        return data
+    except FileNotFoundError:
+        logging.error(f"{data_path} not found")
+        raise
 
 # Preprocess dataset to set labels based on 70% booking ratio
 def preprocess_labels(data):
@@ -74,7 +94,8 @@ def preprocess_data(data):
     return X_all, y_all
 
 # Train the model
-def train_model():
+def train_model(data_path="balanced_dataset.csv"):
+    data = load_data(data_path)
     # Preprocess labels based on 70% threshold
     data_processed = preprocess_labels(data)
     validate_data(data_processed)
@@ -132,14 +153,224 @@ def train_model():
 
     return model, scaler, feature_names
 
+# Feature rows for one chunk of raw station data, in FEATURE_NAMES order
+def chunk_features(chunk):
+    chunk = preprocess_labels(chunk)
+    validate_data(chunk)
+    X, y = preprocess_data(chunk)
+    X = pd.get_dummies(X, columns=['time_slot'], prefix='time_slot')
+    X = X.reindex(columns=FEATURE_NAMES).astype(np.float32)
+    # Dummy columns missing from a chunk are all-zero, not missing
+    dummy_cols = [col for col in FEATURE_NAMES if col.startswith('time_slot_')]
+    X[dummy_cols] = X[dummy_cols].fillna(0)
+    return X.to_numpy(), y.to_numpy(dtype=np.float32)
+
+# Deterministic 80/20 split by row position: every fifth row is held out
+def holdout_mask(start, stop):
+    return np.arange(start, stop) % 5 == 0
+
+class MemmapBatchIter(xgb.DataIter):
+    """
+    Feed XGBoost fixed-size batches of training rows from memory-mapped feature
+    and label files, skipping the held-out rows of each batch.
+    """
+    def __init__(self, X, y, weights, scaler, batch_size, cache_prefix):
+        self.X, self.y, self.weights = X, y, weights
+        self.scaler = scaler
+        self.batch_size = batch_size
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        n_rows = len(self.y)
+        while self._position < n_rows:
+            start, stop = self._position, min(self._position + self.batch_size, n_rows)
+            self._position = stop
+            train = ~holdout_mask(start, stop)
+            if not train.any():
+                continue
+            labels = self.y[start:stop][train]
+            input_data(data=scale_batch(self.scaler, self.X[start:stop][train]), label=labels,
+                       weight=self.weights[labels.astype(int)])
+            return True
+        return False
+
+    def reset(self):
+        self._position = 0
+
+# Impute with the scaler's (NaN-ignoring) mean, i.e. 0 after scaling
+def scale_batch(scaler, X):
+    scaled = scaler.transform(pd.DataFrame(X, columns=FEATURE_NAMES))
+    return np.nan_to_num(scaled, nan=0.0).astype(np.float32)
+
+# Probability histogram resolution for the streaming ROC-AUC estimate
+AUC_BINS = 1000
+
+def binned_roc_auc(histograms):
+    """
+    ROC-AUC from per-class probability histograms (row 0: negatives, row 1: positives).
+    Pairs in the same bin count as ties, so the error is bounded by the bin width.
+    """
+    negatives, positives = histograms[0].astype(np.float64), histograms[1].astype(np.float64)
+    if not negatives.sum() or not positives.sum():
+        return None
+    negatives_below = np.cumsum(negatives) - negatives
+    return float((positives * (negatives_below + 0.5 * negatives)).sum() / (negatives.sum() * positives.sum()))
+
+def confusion_report(confusion):
+    """Per-class precision, recall, F1 and support from a 2x2 [actual, predicted] confusion matrix."""
+    lines = [f"{'':>12}{'precision':>10}{'recall':>10}{'f1-score':>10}{'support':>10}"]
+    for label in range(2):
+        true_positives = confusion[label, label]
+        predicted, support = confusion[:, label].sum(), confusion[label].sum()
+        precision = true_positives / predicted if predicted else 0.0
+        recall = true_positives / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        lines.append(f"{label:>12}{precision:>10.2f}{recall:>10.2f}{f1:>10.2f}{support:>10}")
+    total = confusion.sum()
+    accuracy = np.trace(confusion) / total if total else 0.0
+    lines.append(f"{'accuracy':>12}{'':>20}{accuracy:>10.2f}{total:>10}")
+    return "\n".join(lines)
+
+def train_model_streaming(data_path="balanced_dataset.csv", chunksize=100000, work_dir=None):
+    """
+    Out-of-core variant of train_model for booking histories that do not fit in memory.
+
+    Pass 1 streams the CSV in chunks, writes feature rows to memory-mapped files on
+    disk and fits the scaler incrementally. Training then reads fixed-size batches
+    through an XGBoost DataIter into an external-memory DMatrix, with per-class
+    sample weights instead of SMOTE, so peak memory depends on the chunk size
+    rather than on the length of the history. A temporary work_dir is removed
+    once the model is loaded.
+    """
+    owns_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='load_balancer_')
+    try:
+        return _train_streaming(data_path, chunksize, work_dir)
+    finally:
+        # The model is loaded into memory by now; the feature files and DMatrix cache are scratch
+        if owns_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def _train_streaming(data_path, chunksize, work_dir):
+    features_path = os.path.join(work_dir, 'features.f32')
+    labels_path = os.path.join(work_dir, 'labels.f32')
+    scaler = StandardScaler()
+    n_rows = 0
+    # Training-row class counts, gathered while streaming
+    class_counts = np.zeros(2, dtype=np.int64)
+    with open(features_path, 'wb') as features_file, open(labels_path, 'wb') as labels_file:
+        for chunk in pd.read_csv(data_path, chunksize=chunksize):
+            X, y = chunk_features(chunk)
+            scaler.partial_fit(pd.DataFrame(X, columns=FEATURE_NAMES))
+            features_file.write(np.ascontiguousarray(X).tobytes())
+            labels_file.write(y.tobytes())
+            train = ~holdout_mask(n_rows, n_rows + len(y))
+            class_counts += np.bincount(y[train].astype(int), minlength=2)[:2]
+            n_rows += len(y)
+    logging.info(f"Streamed {n_rows} training rows to {work_dir}")
+
+    X = np.memmap(features_path, dtype=np.float32, mode='r', shape=(n_rows, len(FEATURE_NAMES)))
+    y = np.memmap(labels_path, dtype=np.float32, mode='r', shape=(n_rows,))
+
+    # Balanced class weights replace materialised SMOTE copies
+    negatives, positives = (int(count) for count in class_counts)
+    n_train = negatives + positives
+    weights = np.array([
+        n_train / (2.0 * max(negatives, 1)),
+        n_train / (2.0 * max(positives, 1))
+    ], dtype=np.float32)
+    logging.info(f"Class counts: 0={negatives}, 1={positives}; weights: {weights.tolist()}")
+
+    batch_size = max(1, chunksize)
+    train_iter = MemmapBatchIter(X, y, weights, scaler, batch_size,
+                                 cache_prefix=os.path.join(work_dir, 'train_cache'))
+    dtrain = xgb.DMatrix(train_iter)
+    booster = xgb.train(
+        {'objective': 'binary:logistic', 'max_depth': 3, 'eta': 0.05, 'seed': 42,
+         'tree_method': 'hist', 'eval_metric': 'auc'},
+        dtrain,
+        num_boost_round=100
+    )
+
+    # Evaluate on the held-out rows one batch at a time, keeping only counts
+    confusion = np.zeros((2, 2), dtype=np.int64)
+    histograms = np.zeros((2, AUC_BINS), dtype=np.int64)
+    for start in range(0, n_rows, batch_size):
+        stop = min(start + batch_size, n_rows)
+        test = holdout_mask(start, stop)
+        labels = np.asarray(y[start:stop][test]).astype(int)
+        probabilities = booster.predict(xgb.DMatrix(scale_batch(scaler, X[start:stop][test])))
+        predicted = (probabilities > 0.5).astype(int)
+        confusion += np.bincount(2 * labels + predicted, minlength=4).reshape(2, 2)
+        bins = np.minimum((probabilities * AUC_BINS).astype(int), AUC_BINS - 1)
+        for label in range(2):
+            histograms[label] += np.bincount(bins[labels == label], minlength=AUC_BINS)
+    logging.info("Classification Report:\n" + confusion_report(confusion))
+    roc_auc = binned_roc_auc(histograms)
+    if roc_auc is not None:
+        logging.info(f"ROC-AUC Score: {roc_auc:.2f}")
+
+    # Wrap the booster so the app keeps calling model.predict() for class labels
+    booster_path = os.path.join(work_dir, 'booster.json')
+    booster.save_model(booster_path)
+    model = XGBClassifier()
+    model.load_model(booster_path)
+    return model, scaler, FEATURE_NAMES
+
+def reference_profile(model, scaler, data_path="balanced_dataset.csv", chunksize=100000):
+    """
+    Training-time histograms of the raw inputs (booking_ratio, total_slots, time
+    slot) and the model's recommended rate per slot, streamed over the training
+    data. The app's drift monitor compares live traffic against this profile.
+    """
+    counts = {name: np.zeros(len(cuts) + 1, dtype=np.int64) for name, cuts in PROFILE_CUTS.items()}
+    slot_counts = np.zeros(len(SLOTS), dtype=np.int64)
+    recommended = np.zeros(len(SLOTS), dtype=np.int64)
+    slot_cols = [FEATURE_NAMES.index(f"time_slot_{slot}") for slot in SLOTS]
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        X, _ = chunk_features(chunk)
+        values = {
+            'total_slots': X[:, FEATURE_NAMES.index('Total_Slots')],
+            'booking_ratio': X[:, FEATURE_NAMES.index('booking_ratio')]
+        }
+        for name, cuts in PROFILE_CUTS.items():
+            counts[name] += np.bincount(np.digitize(values[name], cuts), minlength=len(cuts) + 1)
+        slots = np.argmax(X[:, slot_cols], axis=1)
+        predictions = model.predict(scale_batch(scaler, X))
+        slot_counts += np.bincount(slots, minlength=len(SLOTS))
+        recommended += np.bincount(slots[predictions == 1], minlength=len(SLOTS))
+
+    features = {name: {'cuts': cuts, 'counts': counts[name].tolist()} for name, cuts in PROFILE_CUTS.items()}
+    features['time_slot'] = {'counts': slot_counts.tolist()}
+    return {
+        'features': features,
+        'recommended_rate': {
+            slot: round(float(recommended[i]) / int(slot_counts[i]), 4) if slot_counts[i] else None
+            for i, slot in enumerate(SLOTS)
+        },
+        'rows': int(slot_counts.sum())
+    }
+
 # Save model
-def save_model():
-    model, scaler, feature_names = train_model()
+def save_model(data_path="balanced_dataset.csv", streaming=False, chunksize=100000):
+    if streaming:
+        model, scaler, feature_names = train_model_streaming(data_path, chunksize)
+    else:
+        model, scaler, feature_names = train_model(data_path)
+    profile = reference_profile(model, scaler, data_path, chunksize)
+    logging.info(f"Reference recommended rate per slot: {profile['recommended_rate']}")
     os.makedirs('Models2/Models2', exist_ok=True)
     model_path = 'Models2/Models2/load_balancing_model.pkl'
     with open(model_path, 'wb') as f:
-        pickle.dump({'model': model, 'scaler': scaler, 'feature_names': feature_names}, f)
+        pickle.dump({'model': model, 'scaler': scaler, 'feature_names': feature_names,
+                     'reference_profile': profile}, f)
     logging.info(f"Model saved to {model_path}")
 
 if __name__ == '__main__':
-    save_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the load balancing model")
+    parser.add_argument('--data', default="balanced_dataset.csv")
+    parser.add_argument('--streaming', action='store_true', help="Out-of-core training for large booking histories")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Rows per streamed chunk")
+    args = parser.parse_args()
+    save_model(args.data, streaming=args.streaming, chunksize=args.chunksize)
\ No newline at end of file
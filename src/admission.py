@@ -0,0 +1,175 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, g, jsonify, make_response
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+
+
+def remaining_time(default=None):
+    """
+    Seconds left before the current request's deadline, or `default` without one.
+    """
+    deadline = getattr(g, 'deadline', None)
+    if deadline is None:
+        return default
+    return max(0.0, deadline - time.monotonic())
+
+
+class RateLimiter:
+    """
+    Per-client token buckets held in memory; the least recently seen clients are
+    evicted beyond `max_clients` so memory stays bounded.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, client):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+class StaleCache:
+    """Small LRU of recent successful responses, served when the endpoint is shedding load."""
+
+    def __init__(self, max_entries=2048, max_age=300.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, response):
+        entry = (time.monotonic(), response.get_data(), response.status_code, response.mimetype,
+                 response.headers.get('Content-Encoding'))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.max_age:
+            return None
+        stored_at, body, status, mimetype, encoding = entry
+        response = make_response(body, status)
+        response.mimetype = mimetype
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['X-Degraded'] = 'stale'
+        response.headers['Age'] = str(int(time.monotonic() - stored_at))
+        return response
+
+
+class AdmissionController:
+    """
+    Admission control for expensive endpoints: a concurrency limit per endpoint,
+    per-client rate limiting, client deadlines and a degraded mode that serves
+    recently cached results instead of queueing when the endpoint is saturated.
+    """
+
+    def __init__(self, rate=10.0, burst=20.0, max_queue_wait=0.5):
+        self.rate_limiter = RateLimiter(rate, burst)
+        self.max_queue_wait = max_queue_wait
+        self._limits = {}
+        self._caches = {}
+        self._metrics_lock = threading.Lock()
+        self._metrics = {}
+
+    def _count(self, endpoint, outcome):
+        with self._metrics_lock:
+            counters = self._metrics.setdefault(endpoint, {})
+            counters[outcome] = counters.get(outcome, 0) + 1
+
+    def _shed(self, endpoint, reason, cache_key):
+        self._count(endpoint, f"shed_{reason}")
+        if cache_key is not None:
+            cached = self._caches[endpoint].get(cache_key)
+            if cached is not None:
+                self._count(endpoint, 'served_stale')
+                return cached
+        status = 429 if reason == 'rate_limited' else 504 if reason == 'deadline' else 503
+        response = make_response(jsonify({"error": "Service is busy, please retry shortly"}), status)
+        response.headers['Retry-After'] = '1'
+        return response
+
+    def guard(self, endpoint, max_concurrency, cache_key_fn=None):
+        """
+        Decorate a view with admission control. `cache_key_fn()` returns a key for
+        the stale-result cache, or None when the request should not be cached.
+        A TimeoutError escaping the view is treated as the deadline running out.
+        """
+        semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._limits[endpoint] = (semaphore, max_concurrency)
+        self._caches[endpoint] = StaleCache()
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method == 'OPTIONS':
+                    return view(*args, **kwargs)
+
+                budget_ms = request.headers.get(DEADLINE_HEADER, type=float)
+                if budget_ms is not None:
+                    g.deadline = time.monotonic() + budget_ms / 1000.0
+                cache_key = cache_key_fn() if cache_key_fn else None
+
+                # Forwarded headers are only honoured through ProxyFix behind a configured proxy
+                client = request.remote_addr or ''
+                if not self.rate_limiter.allow(client):
+                    return self._shed(endpoint, 'rate_limited', cache_key)
+
+                wait = min(self.max_queue_wait, remaining_time(self.max_queue_wait))
+                if wait <= 0:
+                    return self._shed(endpoint, 'deadline', cache_key)
+                if not semaphore.acquire(timeout=wait):
+                    return self._shed(endpoint, 'saturated', cache_key)
+                try:
+                    if remaining_time(1.0) <= 0:
+                        return self._shed(endpoint, 'deadline', cache_key)
+                    response = make_response(view(*args, **kwargs))
+                except TimeoutError:
+                    # The deadline ran out inside the view (e.g. waiting on a batched prediction)
+                    return self._shed(endpoint, 'deadline', cache_key)
+                finally:
+                    semaphore.release()
+
+                self._count(endpoint, 'admitted')
+                # Views set g.degraded when they fell back to placeholder results; never replay those
+                if getattr(g, 'degraded', False):
+                    self._count(endpoint, 'degraded')
+                    response.headers['X-Degraded'] = 'fallback'
+                elif cache_key is not None and response.status_code == 200:
+                    self._caches[endpoint].put(cache_key, response)
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._metrics_lock:
+            metrics = {endpoint: dict(counters) for endpoint, counters in self._metrics.items()}
+        for endpoint, (semaphore, limit) in self._limits.items():
+            metrics.setdefault(endpoint, {})['max_concurrency'] = limit
+            # BoundedSemaphore keeps its free permits in _value
+            metrics[endpoint]['in_flight'] = limit - semaphore._value
+        return metrics
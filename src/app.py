@@ -1,15 +1,32 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import pickle
-from datetime import datetime
-import uuid
+from datetime import datetime, timedelta
 import sys
 import os
 import math
 import traceback
+from collections import Counter
 import pymongo
 from bson.objectid import ObjectId
-from database import insert_user, insert_provider
+from database import (insert_user, insert_provider, get_db, get_catalogue_version, MongoSlotStore,
+                      find_profile, PENDING_VERSION)
+from batching import PredictionBatcher, BatcherOverloaded
+from ranking import LoadAwareRanker
+from forecasting import OccupancyForecaster, SLOT_HOURS
+from serialization import station_list_response
+from http_cache import catalogue_etag, is_not_modified, add_cache_headers, not_modified_response
+from reservations import (ReservationEngine, InMemorySlotStore, SlotUnavailable, ReservationNotFound,
+                          interval_keys)
+from clustering import ClusterPyramid
+from rollups import UtilisationRollups
+from admission import AdmissionController, remaining_time
+from sessions import SessionManager, ProfileCache, SESSION_COOKIE
+from ledger import Ledger, LocalAnchorBackend
+from monitoring import DriftMonitor
+from bulk_import import import_stations, import_users, read_chunks
+from sharding import ShardCoordinator, CATALOGUE_COLUMNS
 import numpy as np
 import pandas as pd
 import logging
@@ -20,11 +37,38 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
-app.secret_key = 'EVOYA52025'
+
+# Session tokens are signed with this key; read it from the environment or a secret file
+def load_secret_key():
+    secret_key = os.environ.get('EVOYA_SECRET_KEY')
+    secret_file = os.environ.get('EVOYA_SECRET_KEY_FILE')
+    if not secret_key and secret_file:
+        try:
+            with open(secret_file) as f:
+                secret_key = f.read().strip()
+        except OSError as e:
+            logger.error(f"Cannot read secret key file {secret_file}: {e}")
+            raise Exception("Session signing key file is unreadable. Check EVOYA_SECRET_KEY_FILE.")
+    if not secret_key:
+        logger.error("No session signing key configured; set EVOYA_SECRET_KEY or EVOYA_SECRET_KEY_FILE")
+        raise Exception("Session signing key is not configured. Set EVOYA_SECRET_KEY or EVOYA_SECRET_KEY_FILE.")
+    return secret_key
+
+app.secret_key = load_secret_key()
+
+# Behind a reverse proxy, trust X-Forwarded-For from that many hops so rate limits
+# key on the real client; left unset, forwarded headers are ignored
+trusted_proxies = int(os.environ.get('EVOYA_TRUSTED_PROXIES', 0))
+if trusted_proxies > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
 
 # Configure CORS
 CORS(app, origins="http://localhost:5173", supports_credentials=True)
 
+# Signed session tokens and a bounded cache of user profiles
+sessions = SessionManager(app.secret_key)
+profile_cache = ProfileCache(find_profile, max_entries=int(os.environ.get('EVOYA_PROFILE_CACHE_SIZE', 10000)))
+
 # Add project directories to Python path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'Models2')))
@@ -37,19 +81,26 @@ except ImportError as e:
     logger.error(f"Error importing ChargingStationRecommender: {e}")
     raise
 
+# Sharded catalogue mode: nearest-station queries are scattered over shard nodes
+# (see sharding.py) and this process keeps only a slim per-station index
+shard_nodes = [url for url in os.environ.get('EVOYA_SHARD_NODES', '').split(',') if url]
+
 # Load the nearby stations model
-try:
-    with open(os.path.join('Models2', 'Models2', 'CS_rec.pkl'), 'rb') as file:
-        nearby_model = pickle.load(file)
-except ModuleNotFoundError as e:
-    logger.error(f"Module not found: {e}")
-    raise Exception("Cannot load pickle file due to missing module. Ensure 'station_recommender' is available.")
-except FileNotFoundError:
-    logger.error(f"Pickle file not found at {os.path.join('Models2', 'Models2', 'CS_rec.pkl')}")
-    raise Exception("Pickle file not found. Check the file path.")
-except Exception as e:
-    logger.error(f"Error loading CS_rec.pkl: {e}")
-    raise
+if shard_nodes:
+    nearby_model = None
+else:
+    try:
+        with open(os.path.join('Models2', 'Models2', 'CS_rec.pkl'), 'rb') as file:
+            nearby_model = pickle.load(file)
+    except ModuleNotFoundError as e:
+        logger.error(f"Module not found: {e}")
+        raise Exception("Cannot load pickle file due to missing module. Ensure 'station_recommender' is available.")
+    except FileNotFoundError:
+        logger.error(f"Pickle file not found at {os.path.join('Models2', 'Models2', 'CS_rec.pkl')}")
+        raise Exception("Pickle file not found. Check the file path.")
+    except Exception as e:
+        logger.error(f"Error loading CS_rec.pkl: {e}")
+        raise
 
 # Load the load balancing model
 try:
@@ -58,6 +109,8 @@ try:
         load_balancer = load_balancer_data['model']
         scaler = load_balancer_data['scaler']
         feature_names = load_balancer_data['feature_names']
+        # Models trained before drift monitoring have no reference profile
+        reference_profile = load_balancer_data.get('reference_profile')
 except FileNotFoundError:
     logger.error(f"Pickle file not found at {os.path.join('Models2', 'Models2', 'load_balancing_model.pkl')}")
     raise Exception("Load balancing model file not found. Check the file path.")
@@ -65,11 +118,239 @@ except Exception as e:
     logger.error(f"Error loading load_balancing_model.pkl: {e}")
     raise
 
+# Station lookups and the per-station columns behind forecasts, clusters, rollups and capacity
+if shard_nodes:
+    station_finder = ShardCoordinator(shard_nodes)
+    catalogue = station_finder.station_index()
+else:
+    station_finder = nearby_model
+    catalogue = nearby_model.df[CATALOGUE_COLUMNS[1:]].assign(station_id=nearby_model.station_ids())
+logger.info(f"Catalogue index holds {len(catalogue)} stations")
+
 # Debug: Log available methods in models
-logger.debug("Available methods in nearby model: %s", dir(nearby_model))
+logger.debug("Available methods in station finder: %s", dir(station_finder))
 logger.debug("Available methods in load balancer: %s", dir(load_balancer))
 logger.debug("Expected feature names: %s", feature_names)
 
+# Admission control for the expensive endpoints; cheap ones (signin etc.) stay unguarded
+admission = AdmissionController(
+    rate=float(os.environ.get('EVOYA_RATE_LIMIT_PER_SECOND', 10)),
+    burst=float(os.environ.get('EVOYA_RATE_LIMIT_BURST', 20)),
+    max_queue_wait=float(os.environ.get('EVOYA_MAX_QUEUE_WAIT_SECONDS', 0.5))
+)
+
+def location_cache_key():
+    """
+    Stale-cache key for location queries, rounded to ~1 km so nearby requests share results.
+    Responses personalised by a session (e.g. connectorMatch) are keyed by its user id.
+    """
+    data = request.get_json(silent=True) or request.args
+    try:
+        lat, lng = round(float(data.get('lat')), 2), round(float(data.get('lng')), 2)
+    except (TypeError, ValueError):
+        return None
+    session = sessions.from_request(request)
+    return (request.path, lat, lng, session["uid"] if session else None,
+            request.headers.get('Accept', ''), request.headers.get('Accept-Encoding', ''))
+
+# Coalesce load balancer predictions from concurrent requests into one model call
+def predict_recommended(features):
+    return load_balancer.predict(scaler.transform(features))
+
+prediction_batcher = PredictionBatcher(
+    predict_recommended,
+    max_batch_size=int(os.environ.get('EVOYA_BATCH_MAX_SIZE', 64)),
+    max_wait_ms=float(os.environ.get('EVOYA_BATCH_MAX_WAIT_MS', 5)),
+    max_queue_depth=int(os.environ.get('EVOYA_BATCH_MAX_QUEUE_DEPTH', 1024))
+)
+
+# Live input/prediction histograms compared against the training reference profile
+if reference_profile is None:
+    logger.warning("Load balancing model has no reference profile; drift will be reported without PSI")
+drift_monitor = DriftMonitor(reference_profile, history_hours=int(os.environ.get('EVOYA_DRIFT_HISTORY_HOURS', 24 * 7)))
+
+# Spread recommendations across nearby stations instead of pure distance order
+station_ranker = LoadAwareRanker(
+    distance_scale_km=float(os.environ.get('EVOYA_RANK_DISTANCE_SCALE_KM', 5)),
+    inflight_ttl=float(os.environ.get('EVOYA_RANK_INFLIGHT_TTL', 300))
+)
+RESULT_COUNT = 6
+
+# Interval occupancy forecast per catalogue station, seeded from the booked slot columns
+occupancy_forecaster = OccupancyForecaster(
+    catalogue['station_id'].tolist(),
+    interval_minutes=int(os.environ.get('EVOYA_FORECAST_INTERVAL_MINUTES', 60)),
+    horizon_days=int(os.environ.get('EVOYA_FORECAST_HORIZON_DAYS', 28))
+)
+occupancy_forecaster.seed_from_slots(
+    catalogue['Total_Slots'].fillna(0).to_numpy(),
+    {slot: catalogue[f"{slot}_Booked_slots"].fillna(0).to_numpy() for slot in SLOT_HOURS}
+)
+occupancy_forecaster.refresh()
+
+# Nearest-neighbour graph between stations for "alternatives when full"; sharded mode
+# asks the shard nodes instead
+NEIGHBOUR_K = int(os.environ.get('EVOYA_NEIGHBOUR_K', 8))
+if nearby_model is not None:
+    nearby_model.build_neighbour_graph(NEIGHBOUR_K)
+
+# Slot reservations; capacity per station comes from the catalogue's Total_Slots
+station_capacity = dict(zip(catalogue['station_id'], catalogue['Total_Slots'].fillna(0).astype(int)))
+reservation_engine = ReservationEngine(
+    InMemorySlotStore() if os.environ.get('EVOYA_RESERVATION_STORE') == 'memory' else MongoSlotStore(),
+    station_capacity.get
+)
+
+# Train the forecast from the stored bookings so history survives restarts
+try:
+    history_since = datetime.now() - timedelta(days=occupancy_forecaster.horizon_days)
+    occupancy_forecaster.fit((r['stationId'], r['start'], r['end'])
+                             for r in reservation_engine.store.active_reservations(history_since))
+except Exception as e:
+    logger.error(f"Could not load booking history for the occupancy forecast: {str(e)}")
+
+def record_booking_history(event, reservation):
+    occupancy_forecaster.record(reservation['stationId'], reservation['start'], reservation['end'],
+                                count=1 if event == 'booked' else -1)
+
+reservation_engine.add_listener(record_booking_history)
+
+# Map clusters per zoom level; booked uses the busiest window, matching the "availability" field
+def live_peaks(day):
+    """Most slots booked in any one hour of `day`, per station with bookings that day."""
+    start = datetime(day.year, day.month, day.day)
+    end = start + timedelta(days=1)
+    hourly = Counter()
+    for reservation in reservation_engine.store.active_reservations(start):
+        if reservation['start'] < end:
+            for key in interval_keys(reservation['stationId'], max(reservation['start'], start),
+                                     min(reservation['end'], end), reservation_engine.slot_minutes):
+                hourly[(reservation['stationId'], key)] += 1
+    peaks = {}
+    for (station_id, _), count in hourly.items():
+        peaks[station_id] = max(peaks.get(station_id, 0), count)
+    return peaks
+
+station_clusters = ClusterPyramid(max_zoom=int(os.environ.get('EVOYA_CLUSTER_MAX_ZOOM', 16)), live_loader=live_peaks)
+for station_id, lat, lng, total, booked in zip(
+        catalogue['station_id'], catalogue['lattitude'], catalogue['longitude'],
+        catalogue['Total_Slots'].fillna(0),
+        catalogue[[f"{slot}_Booked_slots" for slot in SLOT_HOURS]].fillna(0).max(axis=1)):
+    station_clusters.upsert(station_id, lat, lng, total, booked)
+
+def update_station_clusters(event, reservation):
+    today = datetime.now().date()
+    day_start = datetime(today.year, today.month, today.day)
+    # Only bookings overlapping today move today's peak; the slot counters hold the truth
+    if reservation['start'] < day_start + timedelta(days=1) and reservation['end'] > day_start:
+        slots = reservation_engine.availability(reservation['stationId'], today)['slots']
+        station_clusters.set_live_peak(reservation['stationId'], today, max(slot['booked'] for slot in slots))
+
+def add_catalogue_stations(documents):
+    """Put stations created through the API or a bulk import on the cluster map."""
+    for document in documents:
+        location = document.get('location') or {}
+        if location.get('lat') is None or location.get('lng') is None:
+            continue
+        key = document.get('siteKey') or str(document['_id'])
+        station_clusters.upsert(key, location['lat'], location['lng'], document.get('Total_Slots') or 0, 0)
+
+reservation_engine.add_listener(update_station_clusters)
+
+# Dashboard utilisation aggregates by station, city, state and network
+utilisation_rollups = UtilisationRollups(
+    catalogue['station_id'].tolist(),
+    catalogue['city'].tolist(),
+    catalogue['state'].tolist(),
+    catalogue['Total_Slots'].fillna(0).to_numpy(),
+    {slot: catalogue[f"{slot}_Booked_slots"].fillna(0).to_numpy() for slot in SLOT_HOURS},
+    history_hours=int(os.environ.get('EVOYA_ROLLUP_HISTORY_HOURS', 24 * 30))
+)
+
+try:
+    utilisation_rollups.seed(reservation_engine.store.active_reservations(
+        datetime.now() - timedelta(hours=utilisation_rollups.history_hours)))
+except Exception as e:
+    logger.error(f"Could not load bookings for the utilisation rollups: {str(e)}")
+
+def update_utilisation_rollups(event, reservation):
+    utilisation_rollups.record(reservation['stationId'], reservation['start'], reservation['end'],
+                               1 if event == 'booked' else -1)
+
+reservation_engine.add_listener(update_utilisation_rollups)
+
+# Tamper-evident record of bookings and charging sessions, committed in Merkle batches
+ledger_dir = os.environ.get('EVOYA_LEDGER_DIR', 'ledger')
+ledger = Ledger(
+    ledger_dir,
+    batch_size=int(os.environ.get('EVOYA_LEDGER_BATCH_SIZE', 256)),
+    batch_interval=float(os.environ.get('EVOYA_LEDGER_BATCH_SECONDS', 1.0)),
+    anchor=LocalAnchorBackend(os.path.join(ledger_dir, 'anchors.log')) if os.environ.get('EVOYA_LEDGER_ANCHOR') == 'local' else None
+)
+
+def record_ledger_booking(event, reservation):
+    ledger.append(f"booking.{event}", {
+        "reservationId": reservation['_id'],
+        "stationId": reservation['stationId'],
+        "userId": reservation.get('userId'),
+        "start": reservation['start'].isoformat(),
+        "end": reservation['end'].isoformat()
+    }, event_id=f"{reservation['_id']}:{event}")
+
+reservation_engine.add_listener(record_ledger_booking)
+RANKING_CANDIDATES = int(os.environ.get('EVOYA_RANK_CANDIDATES', 18))
+
+# Training mean-imputes the booked columns of the other two slots, i.e. the scaler's mean
+imputed_features = dict(zip(feature_names, getattr(scaler, 'mean_', [])))
+
+def build_features(total_slots, booked_slots, time_slot):
+    """
+    Build the load balancer input matrix for one or more stations in a single time slot,
+    with columns named and ordered as in the pickled feature_names.
+    """
+    total_slots = np.atleast_1d(np.asarray(total_slots, dtype=float))
+    booked_slots = np.atleast_1d(np.asarray(booked_slots, dtype=float))
+    booking_ratio = np.divide(booked_slots, total_slots, out=np.zeros_like(booked_slots), where=total_slots > 0)
+    input_data = {
+        'Total_Slots': total_slots,
+        f"{time_slot}_Booked_slots": booked_slots,
+        'booking_ratio': booking_ratio,
+        'time_slot_6AM-11AM': 1 if time_slot == '6AM-11AM' else 0,
+        'time_slot_11AM-4PM': 1 if time_slot == '11AM-4PM' else 0,
+        'time_slot_4PM-10PM': 1 if time_slot == '4PM-10PM' else 0
+    }
+    features = np.zeros((len(total_slots), len(feature_names)))
+    for i, feature in enumerate(feature_names):
+        features[:, i] = input_data.get(feature, imputed_features.get(feature, 0))
+    return features
+
+def predict_batched(features):
+    """
+    Predict through the shared batcher. Raises BatcherOverloaded when the queue is
+    full, so max_queue_depth really bounds the model work in flight.
+    """
+    return prediction_batcher.submit(features, timeout=remaining_time())
+
+def overloaded_response(error):
+    logger.warning(f"Shedding prediction request: {str(error)}")
+    response = jsonify({"error": "Prediction service is busy, please retry shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def predict_monitored(total_slots, booked_slots, time_slot):
+    """
+    Predict for live traffic and count the inputs and results into the drift monitor.
+    """
+    features = build_features(total_slots, booked_slots, time_slot)
+    predictions = predict_batched(features)
+    try:
+        # Histogram exactly what the model saw
+        drift_monitor.record(features[:, feature_names.index('Total_Slots')],
+                             features[:, feature_names.index('booking_ratio')], time_slot, predictions)
+    except Exception as e:
+        logger.warning(f"Drift monitor failed to record: {str(e)}")
+    return predictions
+
 # Haversine formula to calculate distance
 def haversine(lat1, lon1, lat2, lon2):
     R = 6371  # Earth's radius in kilometers
@@ -81,6 +362,8 @@ def haversine(lat1, lon1, lat2, lon2):
     return R * c
 
 # Determine time slot based on hour
+# The load balancer only knows three windows; overnight hours reuse the midday window.
+# Finer-grained demand comes from occupancy_forecaster instead.
 def get_time_slot(hour):
     if 6 <= hour < 11:
         return '6AM-11AM'
@@ -96,11 +379,13 @@ def get_current_user():
     logger.debug(f"Handling {request.method} /api/current-user")
     if request.method == 'OPTIONS':
         return jsonify({}), 200
-    return jsonify({
-        "user_id": "demo123",
-        "name": "Gojo Satoru",
-        "userType": "user"
-    }), 200
+    session = sessions.from_request(request)
+    if not session:
+        return jsonify({"error": "No active session"}), 401
+    profile = profile_cache.get(session["uid"])
+    if profile is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(profile), 200
 
 @app.route('/api/signin', methods=['POST', 'OPTIONS'])
 def signin():
@@ -138,12 +423,16 @@ def signin():
             return jsonify({"error": "Account is not approved yet."}), 403
         
         logger.debug(f"Login successful for email: {email}, userType: {user['userType']}")
-        return jsonify({
+        token = sessions.issue(user)
+        response = jsonify({
             "message": "Login successful",
             "user_id": str(user["_id"]),
             "userType": user["userType"],
-            "name": user["name"]
-        }), 200
+            "name": user["name"],
+            "token": token
+        })
+        response.set_cookie(SESSION_COOKIE, token, max_age=sessions.max_age, httponly=True, samesite='Lax')
+        return response, 200
     
     except Exception as e:
         logger.error(f"Error in signin: {str(e)}")
@@ -155,7 +444,9 @@ def signout():
     logger.debug(f"Handling {request.method} /api/signout")
     if request.method == 'OPTIONS':
         return jsonify({}), 200
-    return jsonify({"message": "Signed out successfully"}), 200
+    response = jsonify({"message": "Signed out successfully"})
+    response.delete_cookie(SESSION_COOKIE)
+    return response, 200
 
 @app.route('/api/update-user-type', methods=['POST', 'OPTIONS'])
 def update_user_type():
@@ -164,10 +455,16 @@ def update_user_type():
         return jsonify({}), 200
     try:
         data = request.get_json()
-        user_id = data.get('userId')
+        session = sessions.from_request(request)
+        if not session:
+            return jsonify({"error": "No active session"}), 401
+        # The session decides whose account changes; a body userId may only repeat it
+        user_id = session["uid"]
+        if data.get('userId') and data.get('userId') != user_id:
+            return jsonify({"error": "Cannot update another user's account"}), 403
         user_type = data.get('userType')
-        if not user_id or not user_type:
-            return jsonify({"error": "userId and userType are required"}), 400
+        if not user_type:
+            return jsonify({"error": "userType is required"}), 400
         
         client = pymongo.MongoClient("mongodb://localhost:27017/")
         db = client["auth_db"]
@@ -182,6 +479,7 @@ def update_user_type():
             else:
                 return jsonify({"error": "User not found"}), 404
         
+        profile_cache.invalidate(user_id)
         return jsonify({"message": "User type updated successfully"}), 200
     except Exception as e:
         logger.error(f"Error in update_user_type: {str(e)}")
@@ -195,10 +493,16 @@ def update_provider_type():
         return jsonify({}), 200
     try:
         data = request.get_json()
-        user_id = data.get('userId')
+        session = sessions.from_request(request)
+        if not session:
+            return jsonify({"error": "No active session"}), 401
+        # The session decides whose account changes; a body userId may only repeat it
+        user_id = session["uid"]
+        if data.get('userId') and data.get('userId') != user_id:
+            return jsonify({"error": "Cannot update another user's account"}), 403
         provider_type = data.get('providerType')
-        if not user_id or not provider_type:
-            return jsonify({"error": "userId and providerType are required"}), 400
+        if not provider_type:
+            return jsonify({"error": "providerType is required"}), 400
         
         client = pymongo.MongoClient("mongodb://localhost:27017/")
         db = client["auth_db"]
@@ -209,6 +513,7 @@ def update_provider_type():
         else:
             return jsonify({"error": "Provider not found"}), 404
         
+        profile_cache.invalidate(user_id)
         return jsonify({"message": "Provider type updated successfully"}), 200
     except Exception as e:
         logger.error(f"Error in update_provider_type: {str(e)}")
@@ -275,52 +580,156 @@ def create_station():
         
         provider_id = insert_provider(data)
         logger.debug(f"Provider created with ID: {provider_id}")
+        add_catalogue_stations([{"_id": provider_id, **data}])
         return jsonify({"message": "Provider created successfully", "provider_id": provider_id}), 201
     except Exception as e:
         logger.error(f"Error in create_station: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/nearby-stations', methods=['POST', 'OPTIONS'])
+NEARBY_RADIUS_KM = 50
+
+def nearby_query():
+    """
+    Read lat/lng from the JSON body (POST) or query string (GET).
+    """
+    if request.method == 'GET':
+        data = request.args
+        return data, data.get('lat', type=float), data.get('lng', type=float)
+    data = request.get_json(silent=True) or {}
+    lat = data.get('lat')
+    lng = data.get('lng')
+    return data, lat, lng
+
+def format_provider_station(station, distance):
+    return {
+        "id": str(station['_id']),
+        "name": station.get('stationName', station['name']),
+        "distance": round(distance, 2),
+        "lat": station['location']['lat'],
+        "lng": station['location']['lng'],
+        "type": station.get('stationType'),
+        "connectors": station.get('connectorTypes', []),
+        "capacity": station.get('chargingCapacity'),
+        "version": None if station.get('catalogueVersion') == PENDING_VERSION else station.get('catalogueVersion', 0)
+    }
+
+def stations_within_radius(db, lat, lng, query=None):
+    query = dict(query or {})
+    query["location"] = {"$exists": True}
+    formatted_stations = []
+    for station in db.providers.find(query):
+        distance = haversine(lat, lng, station['location']['lat'], station['location']['lng'])
+        if distance <= NEARBY_RADIUS_KM:
+            formatted_stations.append(format_provider_station(station, distance))
+    return formatted_stations
+
+def bulk_import_chunks():
+    """
+    Chunks from the request body: a JSON array, a CSV body, or an uploaded 'file' field.
+    """
+    if 'file' in request.files:
+        upload = request.files['file']
+        fmt = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+        return read_chunks(upload.stream, fmt)
+    if request.mimetype == 'text/csv':
+        return read_chunks(request.stream, 'csv')
+    if request.mimetype != 'application/json':
+        raise ValueError("Send a JSON array, a CSV body or a 'file' upload")
+    return read_chunks(request.stream, 'json')
+
+@app.route('/api/stations/bulk', methods=['POST', 'OPTIONS'])
+def bulk_create_stations():
+    logger.debug(f"Handling {request.method} /api/stations/bulk")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        report = import_stations(bulk_import_chunks(), on_inserted=add_catalogue_stations)
+        return jsonify(report), 201 if report["inserted"] else 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in bulk_create_stations: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/users/bulk', methods=['POST', 'OPTIONS'])
+def bulk_create_users():
+    logger.debug(f"Handling {request.method} /api/users/bulk")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        report = import_users(bulk_import_chunks())
+        return jsonify(report), 201 if report["inserted"] else 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in bulk_create_users: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/nearby-stations', methods=['GET', 'POST', 'OPTIONS'])
+@admission.guard('nearby-stations', int(os.environ.get('EVOYA_NEARBY_MAX_CONCURRENCY', 16)), location_cache_key)
 def find_nearest():
     logger.debug(f"Handling {request.method} /api/nearby-stations")
     if request.method == 'OPTIONS':
         return jsonify({}), 200
     try:
-        data = request.get_json()
-        lat = data.get('lat')
-        lng = data.get('lng')
+        data, lat, lng = nearby_query()
         if not lat or not lng:
             return jsonify({"error": "Latitude and longitude are required"}), 400
         
-        client = pymongo.MongoClient("mongodb://localhost:27017/")
-        db = client["auth_db"]
-        stations = db.providers.find({"location": {"$exists": True}})
+        db = get_db()
+        # Revalidate against the catalogue version before scanning any stations
+        version, last_modified = get_catalogue_version(db)
+        etag = catalogue_etag(version, lat, lng, request.headers.get('Accept', ''))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
         
-        formatted_stations = []
-        for station in stations:
-            station_lat = station['location']['lat']
-            station_lng = station['location']['lng']
-            distance = haversine(lat, lng, station_lat, station_lng)
-            if distance <= 50:
-                formatted_stations.append({
-                    "id": str(station['_id']),
-                    "name": station.get('stationName', station['name']),
-                    "distance": round(distance, 2),
-                    "lat": station_lat,
-                    "lng": station_lng,
-                    "type": station.get('stationType'),
-                    "connectors": station.get('connectorTypes', []),
-                    "capacity": station.get('chargingCapacity')
-                })
-        
-        return jsonify(formatted_stations), 200
+        formatted_stations = stations_within_radius(db, lat, lng)
+        response = station_list_response(formatted_stations, request)
+        return add_cache_headers(response, etag, last_modified)
     except Exception as e:
         logger.error(f"Error in find_nearest: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/nearby-stations/delta', methods=['GET', 'POST', 'OPTIONS'])
+def find_nearest_delta():
+    logger.debug(f"Handling {request.method} /api/nearby-stations/delta")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data, lat, lng = nearby_query()
+        if not lat or not lng:
+            return jsonify({"error": "Latitude and longitude are required"}), 400
+        try:
+            since = int(data.get('since', 0))
+        except (TypeError, ValueError):
+            return jsonify({"error": "since must be an integer catalogue version"}), 400
+        
+        db = get_db()
+        version, last_modified = get_catalogue_version(db)
+        if since <= 0:
+            # No client version yet: everything, including stations created before versioning
+            changed = stations_within_radius(db, lat, lng)
+        elif since >= version:
+            changed = []
+        else:
+            changed = stations_within_radius(db, lat, lng, {"catalogueVersion": {"$gt": since}})
+        
+        return jsonify({
+            "version": version,
+            "since": since,
+            "changed": changed
+        }), 200
+    except Exception as e:
+        logger.error(f"Error in find_nearest_delta: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/availability-prediction', methods=['POST', 'OPTIONS'])
+@admission.guard('availability-prediction', int(os.environ.get('EVOYA_PREDICTION_MAX_CONCURRENCY', 8)), location_cache_key)
 def get_availability_prediction():
     logger.debug(f"Handling {request.method} /api/availability-prediction")
     if request.method == 'OPTIONS':
@@ -333,7 +742,8 @@ def get_availability_prediction():
             return jsonify({"error": "Latitude and longitude are required"}), 400
         
         # Get predictions from the model
-        stations = nearby_model.find_nearest(lat, lng)
+        # Over-fetch candidates so the ranker can trade a little distance for lower load
+        stations = station_finder.find_nearest(lat, lng, n=RANKING_CANDIDATES)
         logger.debug(f"Model returned type: {type(stations)}")
         logger.debug(f"Model returned content: {stations.to_dict('records') if isinstance(stations, pd.DataFrame) else stations}")
         
@@ -347,39 +757,51 @@ def get_availability_prediction():
                 return jsonify({"message": "No stations found for the given location"}), 200
             
             logger.debug("Handling DataFrame from model")
-            for _, station in stations.iterrows():
-                # Determine time slot for recommendation
-                hour = datetime.now().hour
-                time_slot = get_time_slot(hour)
-                booked_slots = {
-                    '6AM-11AM': station.get('6AM-11AM_Booked_slots', 0),
-                    '11AM-4PM': station.get('11AM-4PM_Booked_slots', 0),
-                    '4PM-10PM': station.get('4PM-10PM_Booked_slots', 0)
-                }.get(time_slot, 0)
-                
-                # Predict recommendation
-                try:
-                    total_slots = float(station.get('Total_Slots', 0))
-                    input_data = {
-                        'total_slots': total_slots,
-                        'booked_slots': float(booked_slots),
-                        'booking_ratio': booked_slots / total_slots if total_slots > 0 else 0,
-                        'time_slot_6AM-11AM': 1 if time_slot == '6AM-11AM' else 0,
-                        'time_slot_11AM-4PM': 1 if time_slot == '11AM-4PM' else 0,
-                        'time_slot_4PM-10PM': 1 if time_slot == '4PM-10PM' else 0
-                    }
-                    input_array = np.zeros(len(feature_names))
-                    for i, feature in enumerate(feature_names):
-                        input_array[i] = input_data.get(feature, 0)
-                    input_array = input_array.reshape(1, -1)
-                    scaled_input = scaler.transform(input_array)
-                    recommended = bool(load_balancer.predict(scaled_input)[0])
-                except Exception as e:
-                    logger.error(f"Error predicting recommendation: {str(e)}")
-                    recommended = False
+            # Determine time slot for recommendation
+            hour = datetime.now().hour
+            time_slot = get_time_slot(hour)
+            booked_col = f"{time_slot}_Booked_slots"
+            total_slots = stations['Total_Slots'].fillna(0).to_numpy(dtype=float)
+            booked_slots = (stations[booked_col].fillna(0).to_numpy(dtype=float)
+                            if booked_col in stations.columns else np.zeros(len(stations)))
+            
+            # Predict recommendation for all stations in one batched call
+            try:
+                predictions = predict_monitored(total_slots, booked_slots, time_slot)
+            except (BatcherOverloaded, TimeoutError):
+                raise
+            except Exception as e:
+                logger.error(f"Error predicting recommendation: {str(e)}")
+                predictions = np.zeros(len(stations))
+                g.degraded = True
+            
+            # Rank by distance, predicted availability and in-flight recommendations
+            station_keys = stations['station_id'].tolist()
+            order, scores = station_ranker.rank(
+                station_keys, stations['distance'].to_numpy(dtype=float),
+                predictions, total_slots, booked_slots, n=RESULT_COUNT
+            )
+            stations = stations.iloc[order]
+            predictions, scores = np.asarray(predictions)[order], scores[order]
+            station_ranker.record([station_keys[i] for i in order])
+            forecasts = occupancy_forecaster.forecast_many(stations['station_id'])
+            last_updated = datetime.now().isoformat()
+            
+            # Personalise from the cached profile when the caller has a session
+            # Best effort: a profile store outage only loses the personalisation
+            session = sessions.from_request(request)
+            try:
+                profile = profile_cache.get(session["uid"]) if session else None
+            except Exception as e:
+                logger.warning(f"Could not load profile for connector matching: {str(e)}")
+                profile = None
+            preferred_connector = profile.get('preferredConnector') if profile else None
+            
+            for (_, station), prediction, score, forecast in zip(stations.iterrows(), predictions, scores, forecasts):
+                recommended = bool(prediction)
                 
                 formatted_stations.append({
-                    "id": str(uuid.uuid4()),
+                    "id": station['station_id'],
                     "name": station.get('name', 'Unknown'),
                     "distance": float(station.get('distance', 0.0)),
                     "lat": float(station.get('lattitude', lat)),
@@ -390,10 +812,11 @@ def get_availability_prediction():
                         station.get('4PM-10PM_Booked_slots', 0)
                     ) else "Full",
                     "connectorTypes": ["CCS", "Type 2"],  # Sample data
+                    "connectorMatch": preferred_connector in ["CCS", "Type 2"] if preferred_connector else None,
                     "location": f"{station.get('city', 'Unknown')}, {station.get('state', 'Unknown')}",
                     "address": station.get('address', 'Unknown'),
                     "powerAvailable": 50,  # Sample data
-                    "lastUpdated": datetime.now().isoformat(),
+                    "lastUpdated": last_updated,
                     "pricePerKWh": "₹15.00",  # Sample data
                     "status": "Available",
                     "totalSlots": int(station.get('Total_Slots', 0)),
@@ -401,6 +824,8 @@ def get_availability_prediction():
                     "bookedSlots11AM_4PM": int(station.get('11AM-4PM_Booked_slots', 0)),
                     "bookedSlots4PM_10PM": int(station.get('4PM-10PM_Booked_slots', 0)),
                     "recommended": recommended,
+                    "rankScore": round(float(score), 4),
+                    "forecastOccupancy": None if np.isnan(forecast) else round(float(forecast), 2),
                     "weatherSafe": True
                 })
         else:
@@ -408,7 +833,12 @@ def get_availability_prediction():
             return jsonify({"error": f"Unexpected model output type: {type(stations)}"}), 500
         
         logger.debug(f"Formatted stations: {formatted_stations}")
-        return jsonify(formatted_stations), 200
+        return station_list_response(formatted_stations, request)
+    except BatcherOverloaded as e:
+        return overloaded_response(e)
+    except TimeoutError:
+        # Deadline expired; admission control answers with a stale result or a 504
+        raise
     except Exception as e:
         logger.error(f"Error in get_availability_prediction: {str(e)}")
         logger.error(traceback.format_exc())
@@ -429,24 +859,7 @@ def test_prediction():
             return jsonify({"error": "Total slots must be greater than 0"}), 400
         
         booking_ratio = booked_slots / total_slots
-        input_data = {
-            'total_slots': total_slots,
-            'booked_slots': booked_slots,
-            'booking_ratio': booking_ratio,
-            'time_slot_6AM-11AM': 1 if time_slot == '6AM-11AM' else 0,
-            'time_slot_11AM-4PM': 1 if time_slot == '11AM-4PM' else 0,
-            'time_slot_4PM-10PM': 1 if time_slot == '4PM-10PM' else 0
-        }
-        
-        # Ensure all feature_names are present
-        input_array = np.zeros(len(feature_names))
-        for i, feature in enumerate(feature_names):
-            input_array[i] = input_data.get(feature, 0)
-        
-        # Reshape for scaler
-        input_array = input_array.reshape(1, -1)
-        scaled_input = scaler.transform(input_array)
-        prediction = load_balancer.predict(scaled_input)[0]
+        prediction = predict_batched(build_features(total_slots, booked_slots, time_slot))[0]
         
         return jsonify({
             'total_slots': total_slots,
@@ -455,10 +868,335 @@ def test_prediction():
             'time_slot': time_slot,
             'recommended': bool(prediction)
         }), 200
+    except BatcherOverloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in test_prediction: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def station_neighbours(station_id):
+    """
+    The NEIGHBOUR_K stations closest to a station, closest first, with station_id and
+    distance columns; None if the station is unknown.
+    """
+    if nearby_model is not None:
+        row = nearby_model.station_row(station_id)
+        if row is None:
+            return None
+        rows, distances = nearby_model.neighbours(row)
+        return nearby_model.df.iloc[rows].assign(station_id=nearby_model.station_ids()[rows], distance=distances)
+    match = catalogue.index[catalogue['station_id'] == station_id]
+    if len(match) == 0:
+        return None
+    station = catalogue.loc[match[0]]
+    nearest = station_finder.find_nearest(float(station['lattitude']), float(station['longitude']), n=NEIGHBOUR_K + 1)
+    if nearest.empty:
+        return nearest
+    return nearest[nearest['station_id'] != station_id].head(NEIGHBOUR_K).reset_index(drop=True)
+
+@app.route('/api/stations/<station_id>/alternatives', methods=['GET', 'OPTIONS'])
+def get_station_alternatives(station_id):
+    logger.debug(f"Handling {request.method} /api/stations/{station_id}/alternatives")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        neighbours = station_neighbours(station_id)
+        if neighbours is None:
+            return jsonify({"error": "Station not found"}), 404
+        limit = request.args.get('limit', 3, type=int)
+        
+        # Live reservations decide whether a neighbour can take a booking now; full ones are dropped
+        now = datetime.now()
+        time_slot = get_time_slot(now.hour)
+        total_slots = neighbours['Total_Slots'].fillna(0).to_numpy(dtype=float)
+        booked_slots = np.asarray(reservation_engine.booked_counts(neighbours['station_id'].tolist(), now), dtype=float)
+        open_now = total_slots > booked_slots
+        neighbours = neighbours[open_now]
+        total_slots, booked_slots = total_slots[open_now], booked_slots[open_now]
+        distances = neighbours['distance'].to_numpy(dtype=float)
+        try:
+            predictions = predict_monitored(total_slots, booked_slots, time_slot) if len(neighbours) else np.zeros(0)
+        except BatcherOverloaded:
+            raise
+        except Exception as e:
+            logger.error(f"Error predicting recommendation: {str(e)}")
+            predictions = np.zeros(len(neighbours))
+        
+        neighbour_ids = neighbours['station_id'].tolist()
+        order, scores = station_ranker.rank(neighbour_ids, distances, predictions, total_slots, booked_slots, n=limit)
+        alternatives = [{
+            "id": neighbour_ids[i],
+            "name": neighbours.iloc[i].get('name', 'Unknown'),
+            "distance": round(float(distances[i]), 2),
+            "lat": float(neighbours.iloc[i]['lattitude']),
+            "lng": float(neighbours.iloc[i]['longitude']),
+            "availability": "Available",
+            "totalSlots": int(total_slots[i]),
+            "bookedSlots": int(booked_slots[i]),
+            "recommended": bool(predictions[i]),
+            "rankScore": round(float(scores[i]), 4)
+        } for i in order]
+        
+        return jsonify({
+            "stationId": station_id,
+            "timeSlot": time_slot,
+            "alternatives": alternatives
+        }), 200
+    except BatcherOverloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Error in get_station_alternatives: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/station-clusters', methods=['GET', 'OPTIONS'])
+def get_station_clusters():
+    logger.debug(f"Handling {request.method} /api/station-clusters")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        zoom = request.args.get('zoom', type=int)
+        bbox = request.args.get('bbox', '')
+        try:
+            west, south, east, north = (float(value) for value in bbox.split(','))
+        except ValueError:
+            return jsonify({"error": "bbox must be west,south,east,north"}), 400
+        if zoom is None:
+            return jsonify({"error": "zoom is required"}), 400
+        
+        clusters = station_clusters.query(zoom, west, south, east, north)
+        return jsonify({"zoom": zoom, "clusters": clusters}), 200
+    except Exception as e:
+        logger.error(f"Error in get_station_clusters: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/dashboard/utilisation', methods=['GET', 'OPTIONS'])
+def get_dashboard_utilisation():
+    logger.debug(f"Handling {request.method} /api/dashboard/utilisation")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        level = request.args.get('level', 'network')
+        key = request.args.get('key', 'all')
+        hours = request.args.get('hours', 24, type=int)
+        summary = utilisation_rollups.summary(level, key, hours)
+        if summary is None:
+            return jsonify({"error": f"No {level} named {key}"}), 404
+        return jsonify(summary), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in get_dashboard_utilisation: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/occupancy-forecast', methods=['POST', 'OPTIONS'])
+def get_occupancy_forecast():
+    logger.debug(f"Handling {request.method} /api/occupancy-forecast")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data = request.get_json()
+        station_id = data.get('stationId')
+        if station_id is None:
+            return jsonify({"error": "stationId is required"}), 400
+        when = datetime.fromisoformat(data['time']) if data.get('time') else datetime.now()
+        
+        forecast = occupancy_forecaster.forecast(station_id, when)
+        if forecast is None:
+            return jsonify({"error": "Station not found"}), 404
+        profile = occupancy_forecaster.day_profile(station_id)
+        
+        return jsonify({
+            "stationId": station_id,
+            "time": when.isoformat(),
+            "interval": occupancy_forecaster.interval_label(occupancy_forecaster.interval_of(when)),
+            "forecastOccupancy": round(forecast, 2),
+            "intervalMinutes": occupancy_forecaster.interval_minutes,
+            "dayProfile": [round(value, 2) for value in profile]
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in get_occupancy_forecast: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+def format_reservation(reservation):
+    event = 'booked' if reservation['status'] == 'active' else reservation['status']
+    return {
+        "reservation_id": reservation['_id'],
+        "ledgerEventId": f"{reservation['_id']}:{event}",
+        "stationId": reservation['stationId'],
+        "userId": reservation.get('userId'),
+        "start": reservation['start'].isoformat(),
+        "end": reservation['end'].isoformat(),
+        "status": reservation['status']
+    }
+
+@app.route('/api/reservations', methods=['POST', 'OPTIONS'])
+def create_reservation():
+    logger.debug(f"Handling {request.method} /api/reservations")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        session = sessions.from_request(request)
+        if not session:
+            return jsonify({"error": "No active session"}), 401
+        # The session decides who books; a body userId may only repeat it
+        user_id = session["uid"]
+        if data.get('userId') and data.get('userId') != user_id:
+            return jsonify({"error": "Cannot book for another user"}), 403
+        for field in ['stationId', 'start', 'end']:
+            if not data.get(field):
+                return jsonify({"error": f"Missing or null required field: {field}"}), 400
+        start = datetime.fromisoformat(data['start'])
+        end = datetime.fromisoformat(data['end'])
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotencyKey')
+        
+        reservation, created = reservation_engine.reserve(
+            data['stationId'], start, end,
+            user_id=user_id,
+            idempotency_key=idempotency_key
+        )
+        return jsonify(format_reservation(reservation)), 201 if created else 200
+    except SlotUnavailable as e:
+        return jsonify({"error": str(e)}), 409
+    except ReservationNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in create_reservation: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reservations/<reservation_id>', methods=['DELETE', 'OPTIONS'])
+def cancel_reservation(reservation_id):
+    logger.debug(f"Handling {request.method} /api/reservations/{reservation_id}")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        reservation, cancelled = reservation_engine.cancel(reservation_id)
+        if not cancelled:
+            return jsonify({"error": f"Reservation is already {reservation['status']}"}), 409
+        return jsonify(format_reservation(reservation)), 200
+    except ReservationNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error in cancel_reservation: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/stations/<station_id>/slots', methods=['GET', 'OPTIONS'])
+def get_station_slots(station_id):
+    logger.debug(f"Handling {request.method} /api/stations/{station_id}/slots")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        day = datetime.fromisoformat(request.args['date']) if request.args.get('date') else datetime.now()
+        availability = reservation_engine.availability(station_id, day)
+        return jsonify({"stationId": station_id, "date": day.date().isoformat(), **availability}), 200
+    except ReservationNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in get_station_slots: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/charging-sessions', methods=['POST', 'OPTIONS'])
+def record_charging_session():
+    logger.debug(f"Handling {request.method} /api/charging-sessions")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        session = sessions.from_request(request)
+        if not session:
+            return jsonify({"error": "No active session"}), 401
+        # The session decides who charged; a body userId may only repeat it
+        user_id = session["uid"]
+        if data.get('userId') and data.get('userId') != user_id:
+            return jsonify({"error": "Cannot record a session for another user"}), 403
+        for field in ['stationId', 'start', 'end']:
+            if not data.get(field):
+                return jsonify({"error": f"Missing or null required field: {field}"}), 400
+        charging_session = {
+            "stationId": data['stationId'],
+            "userId": user_id,
+            "reservationId": data.get('reservationId'),
+            "start": datetime.fromisoformat(data['start']).isoformat(),
+            "end": datetime.fromisoformat(data['end']).isoformat(),
+            "energyKwh": float(data['energyKwh']) if data.get('energyKwh') is not None else None
+        }
+        event_id = ledger.append('session.completed', charging_session)
+        return jsonify({"ledgerEventId": event_id, **charging_session}), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in record_charging_session: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/ledger/head', methods=['GET', 'OPTIONS'])
+def get_ledger_head():
+    logger.debug(f"Handling {request.method} /api/ledger/head")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    return jsonify(ledger.head()), 200
+
+@app.route('/api/ledger/proof/<event_id>', methods=['GET', 'OPTIONS'])
+def get_ledger_proof(event_id):
+    logger.debug(f"Handling {request.method} /api/ledger/proof/{event_id}")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        proof = ledger.proof(event_id)
+        if proof is None:
+            if ledger.is_pending(event_id):
+                return jsonify({"status": "pending", "retryAfterSeconds": ledger.batch_interval}), 202
+            return jsonify({"error": "Event not found"}), 404
+        return jsonify(proof), 200
+    except Exception as e:
+        logger.error(f"Error in get_ledger_proof: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/monitoring/drift', methods=['GET', 'OPTIONS'])
+def get_drift():
+    logger.debug(f"Handling {request.method} /api/monitoring/drift")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        hours = request.args.get('hours', 24, type=int)
+        return jsonify(drift_monitor.report(hours)), 200
+    except Exception as e:
+        logger.error(f"Error in get_drift: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/metrics', methods=['GET', 'OPTIONS'])
+def get_metrics():
+    logger.debug(f"Handling {request.method} /api/metrics")
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    return jsonify({
+        "prediction_batcher": prediction_batcher.stats(),
+        "station_ranker": station_ranker.stats(),
+        "reservations": reservation_engine.stats(),
+        "admission": admission.stats(),
+        "profile_cache": profile_cache.stats(),
+        "ledger": ledger.head()
+    }), 200
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import threading
+import time
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherOverloaded(RuntimeError):
+    """Raised when the batcher queue is already at its configured depth."""
+
+
+class _PendingRequest:
+    __slots__ = ('rows', 'done', 'result', 'error')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionBatcher:
+    """
+    Coalesce feature rows from concurrent requests into a single model call.
+
+    Requests are queued and a background worker waits up to `max_wait_ms`
+    after the first arrival (or until `max_batch_size` rows are queued),
+    runs `predict_fn` once over the stacked rows and hands each caller back
+    its own slice of the predictions.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0, max_queue_depth=1024):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = float(max_wait_ms) / 1000.0
+        self.max_queue_depth = int(max_queue_depth)
+
+        self._queue = deque()
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._worker = None
+
+        # Batch size histogram in power-of-two buckets: 1, 2, 4, ... max_batch_size
+        self._stats_lock = threading.Lock()
+        self._batch_histogram = {}
+        self._batches = 0
+        self._rows = 0
+        self._rejected = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+            self._worker.start()
+
+    def submit(self, rows, timeout=None):
+        """
+        Queue a 2D array of feature rows and block until its predictions are ready.
+        Returns a 1D array with one prediction per row.
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        if rows.shape[0] == 0:
+            return np.empty(0)
+
+        pending = _PendingRequest(rows)
+        with self._cond:
+            if self._queued_rows + rows.shape[0] > self.max_queue_depth:
+                with self._stats_lock:
+                    self._rejected += 1
+                raise BatcherOverloaded(
+                    f"Prediction queue full ({self._queued_rows}/{self.max_queue_depth} rows)"
+                )
+            self._ensure_worker()
+            self._queue.append(pending)
+            self._queued_rows += rows.shape[0]
+            self._cond.notify()
+
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for batched prediction")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _take_batch(self):
+        """Block for the first request, then gather more until the window closes or the batch is full."""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while self._queued_rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, batch_rows = [], 0
+            while self._queue:
+                # Always take at least one request, even if it alone exceeds max_batch_size
+                next_rows = self._queue[0].rows.shape[0]
+                if batch and batch_rows + next_rows > self.max_batch_size:
+                    break
+                batch.append(self._queue.popleft())
+                batch_rows += next_rows
+            self._queued_rows -= batch_rows
+            return batch, batch_rows
+
+    def _run(self):
+        while True:
+            batch, batch_rows = self._take_batch()
+            try:
+                predictions = np.asarray(self.predict_fn(np.vstack([p.rows for p in batch])))
+                offset = 0
+                for pending in batch:
+                    n = pending.rows.shape[0]
+                    pending.result = predictions[offset:offset + n]
+                    offset += n
+            except Exception as e:
+                logger.error(f"Batched prediction failed for {batch_rows} rows: {str(e)}")
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+            self._record_batch(batch_rows)
+
+    def _record_batch(self, batch_rows):
+        bucket = 1
+        while bucket < batch_rows:
+            bucket *= 2
+        with self._stats_lock:
+            self._batch_histogram[bucket] = self._batch_histogram.get(bucket, 0) + 1
+            self._batches += 1
+            self._rows += batch_rows
+
+    def stats(self):
+        """Return batch size distribution and queue counters."""
+        with self._stats_lock:
+            histogram = {f"<={bucket}": count for bucket, count in sorted(self._batch_histogram.items())}
+            batches, rows, rejected = self._batches, self._rows, self._rejected
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'max_queue_depth': self.max_queue_depth,
+            'queued_rows': self._queued_rows,
+            'batches': batches,
+            'rows': rows,
+            'mean_batch_size': rows / batches if batches else 0.0,
+            'rejected': rejected,
+            'batch_size_histogram': histogram
+        }
@@ -0,0 +1,406 @@
+import argparse
+import codecs
+import csv
+import hashlib
+import io
+import json
+import logging
+import uuid
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from database import (get_db, existing_values, insert_many_unordered,
+                      PENDING_VERSION, publish_catalogue_changes)
+
+logger = logging.getLogger(__name__)
+
+# Station rows follow the cleaned_ev_charging_stations.csv schema; the other provider fields are optional
+STATION_REQUIRED = ['name', 'address', 'lattitude', 'longitude']
+STATION_OPTIONAL = ['state', 'city', 'email', 'phone', 'password', 'openingTime', 'closingTime',
+                    'chargingCapacity', 'stationType', 'connectorTypes', 'Total_Slots']
+USER_REQUIRED = ['name', 'email', 'phone', 'evModel', 'batteryCapacity',
+                 'preferredConnector', 'avgDailyDistance', 'password', 'userType']
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def site_key(name, lat, lng):
+    """Same hashing as ChargingStationRecommender.station_ids, so imported sites match catalogue IDs."""
+    key = f"{str(name).strip().lower()}|{float(lat):.5f}|{float(lng):.5f}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _row_errors(df, mask, message):
+    return [{"row": int(row), "error": message} for row in df.index[mask]]
+
+
+def _missing_required(df, required):
+    errors = []
+    bad = np.zeros(len(df), dtype=bool)
+    for field in required:
+        if field not in df.columns:
+            missing = np.ones(len(df), dtype=bool)
+        else:
+            column = df[field]
+            missing = column.isna().to_numpy() | (column.astype(str).str.strip() == '').to_numpy()
+        missing &= ~bad
+        errors += _row_errors(df, missing, f"Missing or null required field: {field}")
+        bad |= missing
+    return bad, errors
+
+
+def _numeric(df, field):
+    if field not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[field], errors='coerce')
+
+
+def validate_stations(df):
+    """
+    Vectorized validation of a chunk of station rows.
+    Returns (valid rows with site keys, per-row errors).
+    """
+    bad, errors = _missing_required(df, STATION_REQUIRED)
+    lat = _numeric(df, 'lattitude').to_numpy(dtype=float)
+    lng = _numeric(df, 'longitude').to_numpy(dtype=float)
+    out_of_range = ~bad & ~((lat >= -90) & (lat <= 90) & (lng >= -180) & (lng <= 180))
+    errors += _row_errors(df, out_of_range, "Invalid latitude or longitude values")
+    bad |= out_of_range
+    slots = _numeric(df, 'Total_Slots')
+    if 'Total_Slots' in df.columns:
+        invalid = ~bad & df['Total_Slots'].notna().to_numpy() & slots.isna().to_numpy()
+        errors += _row_errors(df, invalid, "Invalid numeric value for Total_Slots")
+        bad |= invalid
+
+    valid = df[~bad].copy()
+    valid['lattitude'] = lat[~bad]
+    valid['longitude'] = lng[~bad]
+    if 'Total_Slots' in valid.columns:
+        valid['Total_Slots'] = slots[~bad]
+    valid['siteKey'] = [site_key(*row) for row in zip(valid['name'], valid['lattitude'], valid['longitude'])]
+
+    repeated = valid['siteKey'].duplicated().to_numpy()
+    errors += _row_errors(valid, repeated, "Duplicate station in import")
+    return valid[~repeated], errors
+
+
+def validate_users(df):
+    bad, errors = _missing_required(df, USER_REQUIRED)
+    numeric = {}
+    for field in ['batteryCapacity', 'avgDailyDistance']:
+        values = _numeric(df, field)
+        invalid = ~bad & values.isna().to_numpy()
+        errors += _row_errors(df, invalid, f"Invalid numeric value for {field}")
+        bad |= invalid
+        numeric[field] = values
+
+    valid = df[~bad].copy()
+    for field, values in numeric.items():
+        valid[field] = values[~bad].astype(float)
+    valid['email'] = valid['email'].astype(str).str.lower()
+    repeated = valid['email'].duplicated().to_numpy()
+    errors += _row_errors(valid, repeated, "Duplicate email in import")
+    return valid[~repeated], errors
+
+
+def _clean(value):
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def station_document(row, batch_id, updated_at):
+    document = {
+        "name": row['name'],
+        "address": row['address'],
+        "location": {"lat": float(row['lattitude']), "lng": float(row['longitude'])},
+        "siteKey": row['siteKey'],
+        "userType": "provider",
+        "status": "approved",  # Set to approved for testing
+        "catalogueVersion": PENDING_VERSION,
+        "importBatch": batch_id,
+        "updatedAt": updated_at
+    }
+    for field in STATION_OPTIONAL:
+        value = _clean(row.get(field))
+        if value is not None:
+            document[field] = value.lower() if field == 'email' else value
+    if 'Total_Slots' in document:
+        document['Total_Slots'] = int(float(document['Total_Slots']))
+    return document
+
+
+def user_document(row):
+    return {
+        "name": row['name'],
+        "email": row['email'],
+        "phone": str(row['phone']),
+        "evModel": row['evModel'],
+        "batteryCapacity": float(row['batteryCapacity']),
+        "preferredConnector": row['preferredConnector'],
+        "avgDailyDistance": float(row['avgDailyDistance']),
+        "password": str(row['password']),
+        "userType": row['userType'],
+        "status": "approved"  # Set to approved for testing
+    }
+
+
+def _new_report():
+    return {"received": 0, "inserted": 0, "duplicates": 0, "errors": []}
+
+
+def _read_until_error(chunks, report):
+    """
+    Yield chunks, counting their rows and reader-level row errors into the report.
+    A malformed stream ends the import; the error is reported against the row
+    where reading stopped and the rows before it are kept.
+    """
+    chunks = iter(chunks)
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        except (ValueError, TypeError, csv.Error) as e:
+            logger.warning(f"Import stopped at row {report['received']}: {str(e)}")
+            report["errors"].append({"row": report["received"], "error": f"Import stopped: {str(e)}"})
+            report["stopped"] = True
+            return
+        skipped = chunk.attrs.get('errors', [])
+        report["received"] += len(chunk) + len(skipped)
+        report["errors"] += skipped
+        if not chunk.empty:
+            yield chunk
+
+
+def import_stations(chunks, db=None, batch_size=DEFAULT_BATCH_SIZE, on_inserted=None):
+    """
+    Import station rows from an iterable of DataFrame chunks into the providers collection.
+    Bad rows are reported and skipped; the catalogue version is bumped once at the end,
+    also when the stream breaks off, so rows already stored are always published.
+    `on_inserted(documents)` is called with each batch of stored documents.
+    """
+    db = db if db is not None else get_db()
+    report = _new_report()
+    # Rows stay PENDING_VERSION until the final bump publishes them under this batch id
+    batch_id = uuid.uuid4().hex
+    updated_at = pd.Timestamp.now(tz='UTC').to_pydatetime()
+
+    try:
+        for chunk in _read_until_error(chunks, report):
+            valid, errors = validate_stations(chunk)
+            report["errors"] += errors
+
+            known_sites = existing_values(db.providers, "siteKey", valid['siteKey'])
+            # Optional column: may be absent, all blank (read as float NaN) or mixed
+            emails = valid['email'] if 'email' in valid.columns else pd.Series(None, index=valid.index, dtype=object)
+            emails = emails.map(lambda value: str(value).lower() if isinstance(value, str) else None)
+            known_emails = existing_values(db.providers, "email", emails.dropna())
+            duplicate = valid['siteKey'].isin(known_sites).to_numpy() | emails.isin(known_emails).to_numpy()
+            report["duplicates"] += int(duplicate.sum())
+            report["errors"] += _row_errors(valid, duplicate, "Station or email already exists")
+            valid = valid[~duplicate]
+
+            for start in range(0, len(valid), batch_size):
+                batch = valid.iloc[start:start + batch_size]
+                documents = [station_document(row, batch_id, updated_at) for _, row in batch.iterrows()]
+                inserted, write_errors = insert_many_unordered(db.providers, documents, batch.index.tolist())
+                report["inserted"] += inserted
+                report["errors"] += write_errors
+                if on_inserted is not None and inserted:
+                    failed = {error["row"] for error in write_errors}
+                    on_inserted([document for document, row in zip(documents, batch.index) if row not in failed])
+    finally:
+        if report["inserted"]:
+            report["catalogueVersion"] = publish_catalogue_changes(db, db.providers, {"importBatch": batch_id})[0]
+    logger.info(f"Station import: {report['inserted']}/{report['received']} inserted, "
+                f"{len(report['errors'])} rows rejected")
+    return report
+
+
+def import_users(chunks, db=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import user rows from an iterable of DataFrame chunks into the users collection.
+    """
+    db = db if db is not None else get_db()
+    report = _new_report()
+    for chunk in _read_until_error(chunks, report):
+        valid, errors = validate_users(chunk)
+        report["errors"] += errors
+
+        known_emails = existing_values(db.users, "email", valid['email'])
+        duplicate = valid['email'].isin(known_emails).to_numpy()
+        report["duplicates"] += int(duplicate.sum())
+        report["errors"] += _row_errors(valid, duplicate, "Email already exists")
+        valid = valid[~duplicate]
+
+        for start in range(0, len(valid), batch_size):
+            batch = valid.iloc[start:start + batch_size]
+            documents = [user_document(row) for _, row in batch.iterrows()]
+            inserted, write_errors = insert_many_unordered(db.users, documents, batch.index.tolist())
+            report["inserted"] += inserted
+            report["errors"] += write_errors
+
+    logger.info(f"User import: {report['inserted']}/{report['received']} inserted, "
+                f"{len(report['errors'])} rows rejected")
+    return report
+
+
+def records_in_chunks(records, chunksize=DEFAULT_BATCH_SIZE):
+    """
+    Split an iterable of dicts into DataFrame chunks whose index is the row number.
+    Columns are kept as objects so numbers such as phone numbers are not turned into floats.
+    Elements that are not objects (or are a ValueError standing in for an unreadable
+    row) are skipped and listed in the chunk's attrs['errors'].
+    If the iterable fails part way, the rows read so far are yielded before the error.
+    """
+    records = iter(records)
+    row = 0
+    failure = None
+    while failure is None:
+        batch, rows, errors = [], [], []
+        while len(batch) + len(errors) < chunksize:
+            try:
+                record = next(records)
+            except StopIteration:
+                break
+            except (ValueError, TypeError, csv.Error) as e:
+                failure = e
+                break
+            if isinstance(record, dict):
+                batch.append(record)
+                rows.append(row)
+            elif isinstance(record, ValueError):
+                errors.append({"row": row, "error": str(record)})
+            else:
+                errors.append({"row": row, "error": "Row is not a JSON object"})
+            row += 1
+        if not batch and not errors:
+            break
+        chunk = pd.DataFrame(batch, index=rows, dtype=object)
+        chunk.attrs['errors'] = errors
+        yield chunk
+    if failure is not None:
+        raise failure
+
+
+def iter_json_array(source, read_size=1 << 16):
+    """
+    Yield the elements of a top-level JSON array from a text or binary file object
+    without loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, eof, started = '', 0, False, False
+    after_value = after_comma = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        data = source.read(read_size)
+        eof = not data
+        text = data if isinstance(data, str) else utf8.decode(data or b'', final=eof)
+        buffer = buffer[position:] + text
+        position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON import")
+            fill()
+            continue
+        char = buffer[position]
+        if not started:
+            if char != '[':
+                raise ValueError("JSON import must be an array of objects")
+            started = True
+            position += 1
+        elif char == ']' and not after_comma:
+            return
+        elif char == ',' and after_value:
+            after_value, after_comma = False, True
+            position += 1
+        elif after_value:
+            raise ValueError("Malformed JSON import")
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Malformed JSON import")
+                fill()
+                continue
+            following = buffer[end:].lstrip()
+            if not eof and (not following or following[0] not in ',]'):
+                # The value may be cut off (e.g. a number split across reads); retry with more input
+                fill()
+                continue
+            position = end
+            after_value, after_comma = True, False
+            yield value
+
+
+def iter_csv_records(source):
+    """
+    Yield the data rows of a CSV file object as dicts of text, blanks as None.
+    A row with the wrong number of fields yields a ValueError in its place, so
+    one bad line is reported without losing its neighbours.
+    """
+    if not isinstance(source, io.TextIOBase):
+        if not isinstance(source, io.BufferedIOBase):
+            source = io.BufferedReader(source)
+        source = io.TextIOWrapper(source, encoding='utf-8', newline='')
+    reader = csv.reader(source)
+    header = next(reader, None)
+    if header is None:
+        return
+    for fields in reader:
+        if not fields:
+            continue  # Blank line, skipped like pandas does
+        if len(fields) != len(header):
+            yield ValueError(f"Expected {len(header)} fields, saw {len(fields)}")
+            continue
+        yield {column: value if value != '' else None for column, value in zip(header, fields)}
+
+
+def read_chunks(source, fmt, chunksize=DEFAULT_BATCH_SIZE):
+    """
+    Stream DataFrame chunks from a CSV or JSON array file path or file object.
+    Row numbers are kept as the chunk index so errors point back at the input.
+    Values are read as text; validation converts the numeric fields.
+    """
+    if fmt == 'csv':
+        if isinstance(source, str):
+            with open(source, newline='', encoding='utf-8') as f:
+                yield from records_in_chunks(iter_csv_records(f), chunksize)
+        else:
+            yield from records_in_chunks(iter_csv_records(source), chunksize)
+    elif fmt == 'json':
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                yield from records_in_chunks(iter_json_array(f), chunksize)
+        else:
+            yield from records_in_chunks(iter_json_array(source), chunksize)
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Bulk import stations or users into MongoDB")
+    parser.add_argument('kind', choices=['stations', 'users'])
+    parser.add_argument('path', help="CSV or JSON array file")
+    parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ('json' if args.path.lower().endswith('.json') else 'csv')
+    chunks = read_chunks(args.path, fmt, args.batch_size)
+    importer = import_stations if args.kind == 'stations' else import_users
+    result = importer(chunks, batch_size=args.batch_size)
+    print(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,193 @@
+import logging
+import math
+import threading
+from datetime import date
+
+# Web Mercator limits; latitudes beyond this do not project
+MAX_LATITUDE = 85.05112878
+TILE_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+def project(lat, lng, zoom):
+    """Web Mercator pixel coordinates of a point at the given zoom."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    scale = TILE_SIZE * (2 ** zoom)
+    x = (lng + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+class ClusterPyramid:
+    """
+    Pre-aggregated station clusters for every zoom level.
+
+    At each zoom the map is cut into square cells of `cell_px` screen pixels and
+    each cell keeps running sums (count, centroid, slots, available stations),
+    so a map view only reads the cells inside its bounding box. Stations are
+    added, removed or updated incrementally; nothing is rebuilt on a pan.
+    A station's bookedSlots is the larger of its catalogue count and today's
+    live peak: the most slots booked in any single hour of the day.
+    `live_loader(day)` returns those peaks ({station key: peak}) and is called
+    whenever the day changes; `set_live_peak` updates one station in between.
+    """
+
+    def __init__(self, min_zoom=0, max_zoom=16, cell_px=64, live_loader=None):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cell_px = cell_px
+        self._levels = {zoom: {} for zoom in range(min_zoom, max_zoom + 1)}
+        # key -> (lat, lng, total slots, effective booked slots) as applied to the cells
+        self._stations = {}
+        self._baseline = {}
+        # Integer handle per station key; cells keep the XOR of member handles,
+        # which is exactly the lone member's handle when a cell holds one station
+        self._handles = {}
+        self._keys = []
+        self.live_loader = live_loader
+        self._live = {}
+        self._live_day = None
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lng, zoom):
+        x, y = project(lat, lng, zoom)
+        return int(x // self.cell_px), int(y // self.cell_px)
+
+    def _handle(self, key):
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = self._handles[key] = len(self._keys)
+            self._keys.append(key)
+        return handle
+
+    def _apply(self, key, station, sign):
+        lat, lng, total_slots, booked_slots = station
+        handle = self._handle(key)
+        available = 1 if total_slots > booked_slots else 0
+        for zoom, cells in self._levels.items():
+            cell_key = self._cell(lat, lng, zoom)
+            cell = cells.get(cell_key)
+            if cell is None:
+                cell = cells[cell_key] = {'count': 0, 'lat': 0.0, 'lng': 0.0, 'available': 0,
+                                          'totalSlots': 0, 'bookedSlots': 0, 'handles': 0}
+            cell['count'] += sign
+            cell['lat'] += sign * lat
+            cell['lng'] += sign * lng
+            cell['available'] += sign * available
+            cell['totalSlots'] += sign * total_slots
+            cell['bookedSlots'] += sign * booked_slots
+            cell['handles'] ^= handle
+            if cell['count'] <= 0:
+                del cells[cell_key]
+
+    def _place(self, key, station):
+        previous = self._stations.get(key)
+        if previous == station:
+            return
+        if previous is not None:
+            self._apply(key, previous, -1)
+        self._stations[key] = station
+        self._apply(key, station, 1)
+
+    def _refresh(self, key):
+        """Re-apply a station after its baseline or live peak changed."""
+        previous = self._stations.get(key)
+        if previous is None:
+            return
+        lat, lng, total_slots, _ = previous
+        booked = max(self._baseline[key], self._live.get(key, 0))
+        self._place(key, (lat, lng, total_slots, booked))
+
+    def _roll(self, today):
+        if today == self._live_day:
+            return
+        previous = self._live
+        try:
+            self._live = dict(self.live_loader(today)) if self.live_loader else {}
+        except Exception as e:
+            logger.error(f"Could not load live bookings for {today}: {str(e)}")
+            self._live = {}
+        self._live_day = today
+        for key in set(previous) | set(self._live):
+            self._refresh(key)
+
+    def upsert(self, key, lat, lng, total_slots, booked_slots):
+        """Add a station, or move/update it if already present."""
+        with self._lock:
+            self._roll(date.today())
+            self._baseline[key] = max(0, int(booked_slots))
+            booked = max(self._baseline[key], self._live.get(key, 0))
+            self._place(key, (float(lat), float(lng), int(total_slots), booked))
+
+    def remove(self, key):
+        with self._lock:
+            self._baseline.pop(key, None)
+            previous = self._stations.pop(key, None)
+            if previous is not None:
+                self._apply(key, previous, -1)
+
+    def set_live_peak(self, key, day, peak):
+        """Set a station's peak hourly booked count for `day`; ignored unless `day` is today."""
+        with self._lock:
+            self._roll(date.today())
+            if day != self._live_day:
+                return
+            if peak > 0:
+                self._live[key] = int(peak)
+            else:
+                self._live.pop(key, None)
+            self._refresh(key)
+
+    def _cell_ranges(self, zoom, west, south, east, north):
+        x0, y0 = self._cell(north, west, zoom)
+        x1, y1 = self._cell(south, east, zoom)
+        if west > east:
+            # Viewport crosses the antimeridian: split into two x ranges
+            x_max = int(TILE_SIZE * (2 ** zoom) // self.cell_px)
+            return [(x0, x_max, y0, y1), (0, x1, y0, y1)]
+        return [(x0, x1, y0, y1)]
+
+    def query(self, zoom, west, south, east, north):
+        """
+        Clusters intersecting the bounding box at the given zoom, largest first.
+        Single-station clusters carry the station key as 'id'.
+        """
+        zoom = max(self.min_zoom, min(self.max_zoom, int(zoom)))
+        clusters = []
+        with self._lock:
+            self._roll(date.today())
+            cells = self._levels[zoom]
+            for x0, x1, y0, y1 in self._cell_ranges(zoom, west, south, east, north):
+                if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(cells):
+                    keys = ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+                    candidates = ((key, cells.get(key)) for key in keys)
+                else:
+                    candidates = ((key, cell) for key, cell in cells.items()
+                                  if x0 <= key[0] <= x1 and y0 <= key[1] <= y1)
+                for _, cell in candidates:
+                    if not cell:
+                        continue
+                    count = cell['count']
+                    cluster = {
+                        'lat': round(cell['lat'] / count, 6),
+                        'lng': round(cell['lng'] / count, 6),
+                        'count': count,
+                        'availableStations': cell['available'],
+                        'totalSlots': cell['totalSlots'],
+                        'bookedSlots': cell['bookedSlots'],
+                        'utilisation': round(cell['bookedSlots'] / cell['totalSlots'], 3) if cell['totalSlots'] else None
+                    }
+                    if count == 1:
+                        cluster['id'] = self._keys[cell['handles']]
+                    clusters.append(cluster)
+        clusters.sort(key=lambda cluster: -cluster['count'])
+        return clusters
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stations': len(self._stations),
+                'cells_per_zoom': {zoom: len(cells) for zoom, cells in self._levels.items()}
+            }
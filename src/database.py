@@ -1,5 +1,62 @@
 import pymongo
 from bson.objectid import ObjectId
+from datetime import datetime, timezone
+from reservations import DuplicateIdempotencyKey
+
+_client = None
+
+def get_db():
+    """
+    Shared auth_db handle. MongoClient pools connections and is thread-safe,
+    so one client per process avoids a new connection per request.
+    """
+    global _client
+    if _client is None:
+        _client = pymongo.MongoClient("mongodb://localhost:27017/")
+    return _client["auth_db"]
+
+def next_catalogue_version(db):
+    """
+    Bump the station catalogue version; call on every change to provider station data.
+    Returns (version, updated_at).
+    """
+    updated_at = datetime.now(timezone.utc)
+    counter = db.counters.find_one_and_update(
+        {"_id": "station_catalogue"},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": updated_at}},
+        upsert=True,
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    return counter["version"], updated_at
+
+# Stamp for catalogue rows written but not yet published by a version bump.
+# It sorts after every real version, so delta queries return the row until it is
+# stamped and no reader can record a version that skips it.
+PENDING_VERSION = 2 ** 62
+
+def publish_catalogue_changes(db, collection, query):
+    """
+    Bump the catalogue version after the rows matching `query` were written
+    with PENDING_VERSION, then stamp them with it. Returns (version, updated_at).
+    """
+    version, updated_at = next_catalogue_version(db)
+    collection.update_many(
+        {**query, "catalogueVersion": PENDING_VERSION},
+        {"$set": {"catalogueVersion": version, "updatedAt": updated_at}}
+    )
+    return version, updated_at
+
+def get_catalogue_version(db):
+    """
+    Current (version, updated_at) of the station catalogue, (0, None) before any change.
+    """
+    counter = db.counters.find_one({"_id": "station_catalogue"})
+    if not counter:
+        return 0, None
+    updated_at = counter.get("updatedAt")
+    if updated_at is not None and updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return counter["version"], updated_at
 
 def insert_user(data):
     client = pymongo.MongoClient("mongodb://localhost:27017/")
@@ -47,8 +104,129 @@ def insert_provider(data):
         "connectorTypes": data["connectorTypes"],
         "password": data["password"],
         "userType": "provider",
-        "status": "approved"  # Set to approved for testing
+        "status": "approved",  # Set to approved for testing
+        "catalogueVersion": PENDING_VERSION,
+        "updatedAt": datetime.now(timezone.utc)
     }
     
+    # Insert before bumping the version, so no reader sees the new version without the station
     result = providers_collection.insert_one(provider_data)
-    return str(result.inserted_id)
\ No newline at end of file
+    publish_catalogue_changes(db, providers_collection, {"_id": result.inserted_id})
+    return str(result.inserted_id)
+
+class MongoSlotStore:
+    """
+    Slot store backed by MongoDB. Capacity is enforced with conditional updates,
+    so concurrent app processes never push a slot counter past capacity.
+    """
+
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_db()
+        self.counters = self.db["slot_counters"]
+        self.reservations = self.db["reservations"]
+        self.reservations.create_index(
+            "idempotencyKey", unique=True,
+            partialFilterExpression={"idempotencyKey": {"$type": "string"}}
+        )
+
+    def increment_if_below(self, key, capacity):
+        # A DuplicateKeyError means the counter existed but did not match the filter:
+        # either it is full, or another process created it between our match and
+        # upsert. Retry once; a second duplicate really is a full slot.
+        for attempt in range(2):
+            try:
+                counter = self.counters.find_one_and_update(
+                    {"_id": key, "booked": {"$lt": capacity}},
+                    {"$inc": {"booked": 1}},
+                    upsert=True,
+                    return_document=pymongo.ReturnDocument.AFTER
+                )
+                return counter["booked"]
+            except pymongo.errors.DuplicateKeyError:
+                continue
+        return None
+
+    def decrement(self, key):
+        counter = self.counters.find_one_and_update(
+            {"_id": key, "booked": {"$gt": 0}},
+            {"$inc": {"booked": -1}},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return counter["booked"] if counter else 0
+
+    def count(self, key):
+        counter = self.counters.find_one({"_id": key})
+        return counter["booked"] if counter else 0
+
+    def count_many(self, keys):
+        booked = {counter["_id"]: counter["booked"] for counter in self.counters.find({"_id": {"$in": list(keys)}})}
+        return [booked.get(key, 0) for key in keys]
+
+    def insert_reservation(self, reservation):
+        try:
+            self.reservations.insert_one(reservation)
+        except pymongo.errors.DuplicateKeyError:
+            raise DuplicateIdempotencyKey(reservation.get("idempotencyKey"))
+
+    def find_by_idempotency_key(self, key):
+        return self.reservations.find_one({"idempotencyKey": key})
+
+    def find_reservation(self, reservation_id):
+        return self.reservations.find_one({"_id": reservation_id})
+
+    def active_reservations(self, since):
+        return self.reservations.find(
+            {"status": "active", "end": {"$gt": since}},
+            {"stationId": 1, "start": 1, "end": 1}
+        )
+
+    def mark_cancelled(self, reservation_id):
+        result = self.reservations.update_one(
+            {"_id": reservation_id, "status": "active"},
+            {"$set": {"status": "cancelled", "cancelledAt": datetime.now()}}
+        )
+        return result.modified_count == 1
+
+def existing_values(collection, field, values):
+    """
+    Return which of `values` already exist in `field`, with a single $in query.
+    """
+    values = [value for value in set(values) if value]
+    if not values:
+        return set()
+    return {doc[field] for doc in collection.find({field: {"$in": values}}, {field: 1, "_id": 0})}
+
+def insert_many_unordered(collection, documents, row_numbers):
+    """
+    Insert with ordered=False so one bad document does not stop the rest.
+    Returns (inserted_count, errors) with errors keyed by the caller's row numbers.
+    """
+    if not documents:
+        return 0, []
+    try:
+        result = collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), []
+    except pymongo.errors.BulkWriteError as e:
+        details = e.details
+        errors = [
+            {"row": row_numbers[error["index"]], "error": error.get("errmsg", "Write failed")}
+            for error in details.get("writeErrors", [])
+        ]
+        return details.get("nInserted", 0), errors
+
+PROFILE_FIELDS = ["name", "email", "userType", "evModel", "batteryCapacity", "preferredConnector",
+                  "providerType", "stationType", "connectorTypes"]
+
+def find_profile(user_id):
+    """
+    Profile fields for a user or provider id, or None if neither exists.
+    """
+    db = get_db()
+    projection = {field: 1 for field in PROFILE_FIELDS}
+    profile = db.users.find_one({"_id": ObjectId(user_id)}, projection)
+    if profile is None:
+        profile = db.providers.find_one({"_id": ObjectId(user_id)}, projection)
+    if profile is None:
+        return None
+    profile["user_id"] = str(profile.pop("_id"))
+    return profile
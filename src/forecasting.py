@@ -0,0 +1,172 @@
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Hours covered by each of the load balancer's booking windows
+SLOT_HOURS = {
+    '6AM-11AM': (6, 11),
+    '11AM-4PM': (11, 16),
+    '4PM-10PM': (16, 22)
+}
+
+
+class OccupancyForecaster:
+    """
+    Per-station occupancy forecast at a fixed interval resolution (hourly by default).
+
+    Booking history is kept as per-station ring buffers of counts, one row per
+    day, for at most `horizon_days` days. Bookings for future days wait in a
+    small per-day buffer and only enter the ring once their day has arrived,
+    so they never evict real history. `refresh` averages the ring rows into a
+    dense station x interval float32 array, so serving a forecast is a single
+    array lookup. Stations with little history lean on a prior built from the
+    catalogue's booked slot columns.
+    """
+
+    def __init__(self, station_keys, interval_minutes=60, horizon_days=28, prior_weight=3.0,
+                 refresh_seconds=60.0):
+        if 1440 % interval_minutes != 0:
+            raise ValueError("interval_minutes must divide a day evenly")
+        self.interval_minutes = int(interval_minutes)
+        self.intervals_per_day = 1440 // self.interval_minutes
+        self.horizon_days = int(horizon_days)
+        self.prior_weight = float(prior_weight)
+        self.refresh_seconds = float(refresh_seconds)
+
+        self.station_index = {key: i for i, key in enumerate(station_keys)}
+        n = len(self.station_index)
+        self._counts = np.zeros((n, self.horizon_days, self.intervals_per_day), dtype=np.uint16)
+        # Absolute day number held by each ring row, -1 while unused
+        self._ring_day = np.full(self.horizon_days, -1, dtype=np.int64)
+        # Future day number -> {(station row, interval): count}
+        self._upcoming = {}
+        self._prior = np.zeros((n, self.intervals_per_day), dtype=np.float32)
+        self._forecast = np.zeros((n, self.intervals_per_day), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._refreshed_at = 0.0
+
+    def interval_of(self, when):
+        return (when.hour * 60 + when.minute) // self.interval_minutes
+
+    def interval_label(self, interval):
+        start = interval * self.interval_minutes
+        end = start + self.interval_minutes
+        return f"{start // 60:02d}:{start % 60:02d}-{(end // 60) % 24:02d}:{end % 60:02d}"
+
+    def seed_from_slots(self, total_slots, slot_bookings):
+        """
+        Build the prior from the catalogue's per-window booked slot columns.
+        `slot_bookings` maps a time slot name from SLOT_HOURS to an array of booked counts.
+        """
+        total_slots = np.asarray(total_slots, dtype=np.float32)
+        prior = np.zeros_like(self._prior)
+        for slot, booked in slot_bookings.items():
+            start_hour, end_hour = SLOT_HOURS[slot]
+            start = start_hour * 60 // self.interval_minutes
+            end = end_hour * 60 // self.interval_minutes
+            prior[:, start:end] = np.minimum(np.asarray(booked, dtype=np.float32), total_slots)[:, None]
+        with self._lock:
+            self._prior = prior
+            self._dirty = True
+
+    def _ring_row(self, day):
+        row = day % self.horizon_days
+        if self._ring_day[row] != day:
+            if self._ring_day[row] > day:
+                return None  # Older than the history horizon
+            self._counts[:, row, :] = 0
+            self._ring_day[row] = day
+        return row
+
+    def _add(self, i, day, interval, count):
+        row = self._ring_row(day)
+        if row is not None:
+            cell = int(self._counts[i, row, interval]) + count
+            self._counts[i, row, interval] = min(max(cell, 0), np.iinfo(np.uint16).max)
+
+    def _promote(self, today):
+        """Move buffered bookings whose day has arrived into the ring."""
+        for day in [day for day in self._upcoming if day <= today]:
+            for (i, interval), count in self._upcoming.pop(day).items():
+                self._add(i, day, interval, count)
+            self._dirty = True
+
+    def record(self, station_key, start, end=None, count=1):
+        """Add a booking occupying [start, end) to the station's history; count=-1 removes one."""
+        i = self.station_index.get(station_key)
+        if i is None:
+            return
+        end = end or start + timedelta(minutes=self.interval_minutes)
+        step = timedelta(minutes=self.interval_minutes)
+        current = start.replace(minute=start.minute - start.minute % self.interval_minutes,
+                                second=0, microsecond=0)
+        today = datetime.now().toordinal()
+        with self._lock:
+            self._promote(today)
+            while current < end:
+                day = current.toordinal()
+                if day <= today:
+                    self._add(i, day, self.interval_of(current), count)
+                else:
+                    cells = self._upcoming.setdefault(day, {})
+                    key = (i, self.interval_of(current))
+                    cells[key] = cells.get(key, 0) + count
+                current += step
+            self._dirty = True
+
+    def fit(self, bookings):
+        """Rebuild the history from an iterable of (station_key, start, end) bookings."""
+        with self._lock:
+            self._counts[:] = 0
+            self._ring_day[:] = -1
+            self._upcoming.clear()
+        for station_key, start, end in bookings:
+            self.record(station_key, start, end)
+        self.refresh()
+
+    def refresh(self):
+        """Recompute the dense forecast array from the history and the prior."""
+        with self._lock:
+            self._promote(datetime.now().toordinal())
+            valid = self._ring_day >= 0
+            days = int(valid.sum())
+            history = self._counts[:, valid, :].sum(axis=1, dtype=np.float32)
+            self._forecast = ((history + self.prior_weight * self._prior)
+                              / (days + self.prior_weight)).astype(np.float32)
+            self._dirty = False
+            self._refreshed_at = time.monotonic()
+        logger.debug(f"Refreshed occupancy forecast from {days} days of history")
+
+    def _current(self):
+        if self._upcoming and min(self._upcoming) <= datetime.now().toordinal():
+            self._dirty = True
+        if self._dirty and time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            self.refresh()
+        return self._forecast
+
+    def forecast(self, station_key, when=None):
+        """Expected number of occupied slots for the station in the interval containing `when`."""
+        i = self.station_index.get(station_key)
+        if i is None:
+            return None
+        when = when or datetime.now()
+        return float(self._current()[i, self.interval_of(when)])
+
+    def forecast_many(self, station_keys, when=None):
+        indices = np.array([self.station_index.get(key, -1) for key in station_keys], dtype=np.int64)
+        when = when or datetime.now()
+        values = self._current()[np.maximum(indices, 0), self.interval_of(when)]
+        return np.where(indices >= 0, values, np.nan)
+
+    def day_profile(self, station_key):
+        """Forecast for every interval of the day, or None for an unknown station."""
+        i = self.station_index.get(station_key)
+        if i is None:
+            return None
+        return self._current()[i].tolist()
@@ -0,0 +1,41 @@
+import hashlib
+from datetime import timezone
+
+from flask import Response
+
+# Station metadata changes rarely; let clients reuse it briefly, then revalidate
+STATION_CACHE_CONTROL = 'private, max-age=30, stale-while-revalidate=300'
+
+
+def catalogue_etag(version, *query_parts):
+    """ETag for a response derived from the station catalogue version and the query that shaped it."""
+    query = '|'.join(str(part) for part in query_parts)
+    digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]
+    return f"v{version}-{digest}"
+
+
+def is_not_modified(req, etag, last_modified=None):
+    """
+    Evaluate If-None-Match (preferred) or If-Modified-Since against the current validators.
+    """
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    if last_modified is not None and req.if_modified_since is not None:
+        current = last_modified.replace(microsecond=0)
+        if current.tzinfo is None:
+            current = current.replace(tzinfo=timezone.utc)
+        return current <= req.if_modified_since
+    return False
+
+
+def add_cache_headers(response, etag, last_modified=None):
+    # Weak: the bytes differ between gzip, br and identity encodings of the same content
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = STATION_CACHE_CONTROL
+    return response
+
+
+def not_modified_response(etag, last_modified=None):
+    return add_cache_headers(Response(status=304), etag, last_modified)
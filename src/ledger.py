@@ -0,0 +1,302 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+GENESIS_HASH = '0' * 64
+
+
+def canonical(obj):
+    """Deterministic JSON bytes used for hashing."""
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def leaf_hash(event):
+    # Domain-separate leaves from inner nodes so a node can't be passed off as an event
+    return hashlib.sha256(b'\x00' + canonical(event)).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def merkle_levels(leaves):
+    """All tree levels from the leaves up to the root; an odd last node is paired with itself."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = level + [level[-1]]
+        levels.append([node_hash(level[i], level[i + 1]) for i in range(0, len(level), 2)])
+    return levels
+
+
+def merkle_proof(leaves, index):
+    """Sibling path for leaf `index`: a list of (sibling hex, side of the sibling)."""
+    path = []
+    for level in merkle_levels(leaves)[:-1]:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        sibling = index ^ 1
+        path.append((level[sibling].hex(), 'left' if sibling < index else 'right'))
+        index //= 2
+    return path
+
+
+def verify_proof(proof):
+    """
+    Check an inclusion proof from Ledger.proof: the event hashes up to the block's
+    Merkle root and the header hashes to the recorded block hash.
+    """
+    current = leaf_hash(proof['event'])
+    for sibling_hex, side in proof['path']:
+        sibling = bytes.fromhex(sibling_hex)
+        current = node_hash(sibling, current) if side == 'left' else node_hash(current, sibling)
+    header = proof['header']
+    return (current.hex() == header['merkleRoot']
+            and hashlib.sha256(canonical(header)).hexdigest() == proof['blockHash'])
+
+
+class AnchorBackend:
+    """Publishes block hashes somewhere external, e.g. a public chain. Subclass and override anchor()."""
+
+    name = 'none'
+
+    def anchor(self, header, block_hash):
+        raise NotImplementedError
+
+
+class LocalAnchorBackend(AnchorBackend):
+    """Stand-in for a chain: appends anchored block hashes to a local file and returns a fake tx id."""
+
+    name = 'local'
+
+    def __init__(self, path):
+        self.path = path
+
+    def anchor(self, header, block_hash):
+        record = {'height': header['height'], 'blockHash': block_hash, 'anchoredAt': time.time()}
+        with open(self.path, 'ab') as f:
+            f.write(canonical(record) + b'\n')
+        return {'backend': self.name, 'txId': hashlib.sha256(canonical(record)).hexdigest()}
+
+
+class Ledger:
+    """
+    Append-only, hash-chained ledger of charging session and booking events.
+
+    Events are buffered and committed in blocks of up to `batch_size` (or every
+    `batch_interval` seconds). Each block header holds the Merkle root of its
+    events and the previous block's hash, and is written with its events as one
+    line to size-limited segment files. Inclusion proofs carry log2(n) sibling
+    hashes. Block hashes can be anchored through a pluggable AnchorBackend.
+
+    Appending only takes the buffer lock; a full batch wakes the flusher thread,
+    which seals, writes and fsyncs the block under a separate write lock so
+    appends and proof lookups never wait on the disk or the anchor backend.
+    """
+
+    def __init__(self, directory, batch_size=256, batch_interval=1.0, segment_bytes=64 * 1024 * 1024,
+                 anchor=None, cached_blocks=64):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.segment_bytes = segment_bytes
+        self.anchor_backend = anchor
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Held while a block is sealed and written, so blocks reach disk in height order
+        self._write_lock = threading.Lock()
+        self._pending = []
+        # Ids of sealed events whose block is still being written
+        self._sealing = set()
+        self._height = -1
+        self._head_hash = GENESIS_HASH
+        self._segment = 0
+        # event_id -> (height, leaf index); height -> (segment, byte offset of the block line)
+        self._index = {}
+        self._block_locations = {}
+        self._block_cache = OrderedDict()
+        self._cached_blocks = cached_blocks
+        self._replay()
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='ledger-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    def _replay(self):
+        """Rebuild the index from existing segments, re-verifying every block and the chain."""
+        segments = sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+        for name in segments:
+            segment = int(name[len('segment-'):-len('.log')])
+            offset = 0
+            path = os.path.join(self.directory, name)
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Block torn by a crash mid-write; it was never acknowledged, so drop it
+                        logger.warning(f"Truncating partial ledger block at {name}:{offset}")
+                        os.truncate(path, offset)
+                        break
+                    block = json.loads(line)
+                    self._verify_block(block)
+                    self._index_block(block, segment, offset)
+                    offset += len(line)
+            self._segment = segment
+        if self._height >= 0:
+            logger.info(f"Ledger replayed {self._height + 1} blocks, head {self._head_hash[:12]}")
+
+    def _verify_block(self, block):
+        """Recompute a replayed block's Merkle root and hash; raise ValueError on any mismatch."""
+        header = block['header']
+        height = header.get('height')
+        if height != self._height + 1 or header['prevHash'] != self._head_hash:
+            raise ValueError(f"Ledger chain broken at height {height}")
+        events = block['events']
+        if not events or header['count'] != len(events):
+            raise ValueError(f"Ledger block {height} has {len(events)} events, header says {header['count']}")
+        if merkle_levels([leaf_hash(event) for event in events])[-1][0].hex() != header['merkleRoot']:
+            raise ValueError(f"Ledger block {height} events do not match its Merkle root")
+        if hashlib.sha256(canonical(header)).hexdigest() != block['blockHash']:
+            raise ValueError(f"Ledger block {height} header does not match its block hash")
+
+    def _index_block(self, block, segment, offset):
+        header = block['header']
+        for i, event in enumerate(block['events']):
+            self._index[event['id']] = (header['height'], i)
+        self._block_locations[header['height']] = (segment, offset)
+        self._height = header['height']
+        self._head_hash = block['blockHash']
+
+    def append(self, event_type, payload, event_id=None):
+        """Buffer an event for the next block; returns its id (random unless given)."""
+        event = {'id': event_id or uuid.uuid4().hex, 'type': event_type, 'ts': time.time(), 'payload': payload}
+        with self._lock:
+            self._pending.append(event)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        return event['id']
+
+    def commit(self):
+        """
+        Seal up to `batch_size` buffered events into a block and write it.
+        Returns the block header, or None if nothing was pending.
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return None
+                events = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._sealing.update(event['id'] for event in events)
+                # Only the write lock holder seals, so the committed head is the previous block
+                height, prev_hash = self._height + 1, self._head_hash
+            levels = merkle_levels([leaf_hash(event) for event in events])
+            header = {
+                'height': height,
+                'prevHash': prev_hash,
+                'merkleRoot': levels[-1][0].hex(),
+                'timestamp': time.time(),
+                'count': len(events)
+            }
+            block_hash = hashlib.sha256(canonical(header)).hexdigest()
+            block = {'header': header, 'blockHash': block_hash, 'events': events}
+
+            try:
+                path = self._segment_path(self._segment)
+                if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                    self._segment += 1
+                    path = self._segment_path(self._segment)
+                with open(path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(canonical(block) + b'\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception:
+                # Nothing was acknowledged; put the events back for the next attempt
+                with self._lock:
+                    self._pending[:0] = events
+                    self._sealing.clear()
+                raise
+            with self._lock:
+                self._index_block(block, self._segment, offset)
+                self._sealing.clear()
+
+        if self.anchor_backend is not None:
+            try:
+                receipt = self.anchor_backend.anchor(header, block_hash)
+                logger.debug(f"Anchored block {header['height']}: {receipt}")
+            except Exception as e:
+                logger.error(f"Anchoring block {header['height']} failed: {str(e)}")
+        return header
+
+    def _load_block(self, height):
+        block = self._block_cache.get(height)
+        if block is not None:
+            self._block_cache.move_to_end(height)
+            return block
+        segment, offset = self._block_locations[height]
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            block = json.loads(f.readline())
+        self._block_cache[height] = block
+        if len(self._block_cache) > self._cached_blocks:
+            self._block_cache.popitem(last=False)
+        return block
+
+    def proof(self, event_id):
+        """Inclusion proof for a committed event, or None if unknown or still pending."""
+        with self._lock:
+            location = self._index.get(event_id)
+            if location is None:
+                return None
+            height, index = location
+            block = self._load_block(height)
+        leaves = [leaf_hash(event) for event in block['events']]
+        return {
+            'event': block['events'][index],
+            'leafIndex': index,
+            'path': merkle_proof(leaves, index),
+            'header': block['header'],
+            'blockHash': block['blockHash']
+        }
+
+    def is_pending(self, event_id):
+        with self._lock:
+            return event_id in self._sealing or any(event['id'] == event_id for event in self._pending)
+
+    def head(self):
+        with self._lock:
+            return {'height': self._height, 'blockHash': self._head_hash,
+                    'pending': len(self._pending) + len(self._sealing), 'events': len(self._index)}
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.batch_interval)
+            self._wake.clear()
+            try:
+                # Drain every full batch; a partial one waits for the next interval
+                while self.commit() is not None and len(self._pending) >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Ledger commit failed: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        while self.commit() is not None:
+            pass
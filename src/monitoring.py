@@ -0,0 +1,155 @@
+import threading
+import time
+
+import numpy as np
+
+from forecasting import SLOT_HOURS
+
+SLOTS = tuple(SLOT_HOURS)
+
+# Fallback bin cut points for models pickled before reference profiles existed;
+# a profile saved by load_balancing_model.py carries its own cuts
+DEFAULT_CUTS = {
+    'booking_ratio': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0],
+    'total_slots': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 15, 20, 30, 50]
+}
+
+# Conventional PSI reading: below 0.1 stable, up to 0.25 moderate, above that significant
+PSI_THRESHOLDS = (0.1, 0.25)
+
+
+def psi(expected, actual, epsilon=1e-4):
+    """Population stability index between two histograms of the same bins."""
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    p = np.clip(expected / expected.sum(), epsilon, None)
+    q = np.clip(actual / actual.sum(), epsilon, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def bin_labels(cuts):
+    """Readable names for the len(cuts) + 1 bins split at `cuts`."""
+    cuts = [f"{cut:g}" for cut in cuts]
+    return [f"<{cuts[0]}"] + [f"{lo}-{hi}" for lo, hi in zip(cuts, cuts[1:])] + [f">={cuts[-1]}"]
+
+
+def drift_level(value):
+    if value is None:
+        return None
+    if value < PSI_THRESHOLDS[0]:
+        return 'stable'
+    return 'moderate' if value < PSI_THRESHOLDS[1] else 'significant'
+
+
+class DriftMonitor:
+    """
+    Streaming input and prediction drift for the load balancer.
+
+    Live booking_ratio and total_slots values are counted into fixed bins, time
+    slots into one bin each, and predictions into per-slot recommended counts.
+    Counts go into hourly ring buffers covering `history_hours`, so memory is
+    fixed and recording a batch is a couple of bincounts. Reports compare a
+    window of recent hours with the training-time reference profile via PSI.
+    The live time slot mix follows request traffic by hour of day while the
+    reference is uniform over slots, so it is reported without a PSI and kept
+    out of the overall verdict.
+    """
+
+    def __init__(self, reference_profile=None, history_hours=24 * 7):
+        self.reference = reference_profile
+        self.history_hours = int(history_hours)
+        features = (reference_profile or {}).get('features', {})
+        self.cuts = {
+            name: np.asarray(features.get(name, {}).get('cuts', cuts), dtype=float)
+            for name, cuts in DEFAULT_CUTS.items()
+        }
+        self._counts = {
+            name: np.zeros((self.history_hours, len(cuts) + 1), dtype=np.int64)
+            for name, cuts in self.cuts.items()
+        }
+        self._counts['time_slot'] = np.zeros((self.history_hours, len(SLOTS)), dtype=np.int64)
+        # [:, slot, 0] predictions made, [:, slot, 1] of which recommended
+        self._predictions = np.zeros((self.history_hours, len(SLOTS), 2), dtype=np.int64)
+        # Absolute hour number held by each ring row, -1 while unused
+        self._ring_hour = np.full(self.history_hours, -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def _ring_row(self, hour_number):
+        row = hour_number % self.history_hours
+        if self._ring_hour[row] != hour_number:
+            for counts in self._counts.values():
+                counts[row] = 0
+            self._predictions[row] = 0
+            self._ring_hour[row] = hour_number
+        return row
+
+    def record(self, total_slots, booking_ratio, time_slot, predictions):
+        """Count one prediction batch: per-station arrays for a single time slot."""
+        if time_slot not in SLOTS:
+            return
+        slot = SLOTS.index(time_slot)
+        predictions = np.asarray(predictions)
+        bins = {
+            name: np.bincount(np.digitize(np.asarray(values, dtype=float), self.cuts[name]),
+                              minlength=len(self.cuts[name]) + 1)
+            for name, values in (('total_slots', total_slots), ('booking_ratio', booking_ratio))
+        }
+        recommended = int(np.count_nonzero(predictions == 1))
+        with self._lock:
+            row = self._ring_row(int(time.time() // 3600))
+            for name, counts in bins.items():
+                self._counts[name][row] += counts
+            self._counts['time_slot'][row, slot] += len(predictions)
+            self._predictions[row, slot, 0] += len(predictions)
+            self._predictions[row, slot, 1] += recommended
+
+    def report(self, hours=24):
+        """Live histograms and PSI against the reference profile over the last `hours` hours."""
+        hours = max(1, min(int(hours), self.history_hours))
+        current = int(time.time() // 3600)
+        numbers = np.arange(current - hours + 1, current + 1)
+        rows = numbers % self.history_hours
+        with self._lock:
+            valid = self._ring_hour[rows] == numbers
+            live = {name: counts[rows[valid]].sum(axis=0) for name, counts in self._counts.items()}
+            predictions = self._predictions[rows[valid]].sum(axis=0)
+
+        reference_features = (self.reference or {}).get('features', {})
+        features = {}
+        for name, counts in live.items():
+            reference = reference_features.get(name, {}).get('counts')
+            # Time slots are a traffic mix, not a training distribution (see class docstring)
+            comparable = reference is not None and name != 'time_slot'
+            value = psi(reference, counts) if comparable else None
+            features[name] = {
+                'liveCounts': counts.tolist(),
+                'referenceCounts': reference,
+                'bins': bin_labels(self.cuts[name]) if name in self.cuts else list(SLOTS),
+                'psi': round(value, 4) if value is not None else None,
+                'drift': drift_level(value)
+            }
+
+        reference_rates = (self.reference or {}).get('recommended_rate', {})
+        recommended = {}
+        for i, slot in enumerate(SLOTS):
+            made, positive = predictions[i]
+            rate = positive / made if made else None
+            reference = reference_rates.get(slot)
+            recommended[slot] = {
+                'predictions': int(made),
+                'liveRate': round(rate, 4) if rate is not None else None,
+                'referenceRate': reference,
+                'shift': round(rate - reference, 4) if rate is not None and reference is not None else None
+            }
+
+        worst = [f['psi'] for f in features.values() if f['psi'] is not None]
+        return {
+            'windowHours': hours,
+            'hasReference': self.reference is not None,
+            'predictions': int(predictions[:, 0].sum()),
+            'features': features,
+            'recommendedRate': recommended,
+            'drift': drift_level(max(worst)) if worst else None
+        }
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class LoadAwareRanker:
+    """
+    Rank candidate stations by a blend of distance, predicted availability and
+    recent recommendations, so users near a hotspot are spread over several
+    stations instead of all being sent to the closest one.
+
+    Lower scores rank first:
+        distance / distance_scale_km
+        + availability_weight * (1 - predicted_available)
+        + load_weight * (booked_slots + in_flight) / total_slots
+
+    Every station handed out by `record` counts as one in-flight
+    recommendation for `inflight_ttl` seconds.
+    """
+
+    def __init__(self, distance_scale_km=5.0, availability_weight=2.0, load_weight=1.5, inflight_ttl=300.0):
+        self.distance_scale_km = float(distance_scale_km)
+        self.availability_weight = float(availability_weight)
+        self.load_weight = float(load_weight)
+        self.inflight_ttl = float(inflight_ttl)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, key, now):
+        expiries = self._inflight.get(key)
+        if expiries is None:
+            return 0
+        while expiries and expiries[0] <= now:
+            expiries.popleft()
+        if not expiries:
+            del self._inflight[key]
+            return 0
+        return len(expiries)
+
+    def inflight_counts(self, keys):
+        """Number of unexpired recommendations issued for each station key."""
+        now = time.monotonic()
+        with self._lock:
+            return np.array([self._expire(key, now) for key in keys], dtype=float)
+
+    def scores(self, keys, distances, predicted_available, total_slots, booked_slots):
+        distances = np.asarray(distances, dtype=float)
+        predicted_available = np.asarray(predicted_available, dtype=float)
+        total_slots = np.asarray(total_slots, dtype=float)
+        booked_slots = np.asarray(booked_slots, dtype=float)
+
+        pending = booked_slots + self.inflight_counts(keys)
+        # Stations without slot data count as fully loaded
+        load = np.divide(pending, total_slots, out=np.ones_like(pending), where=total_slots > 0)
+        return (distances / self.distance_scale_km
+                + self.availability_weight * (1.0 - predicted_available)
+                + self.load_weight * np.minimum(load, 2.0))
+
+    def rank(self, keys, distances, predicted_available, total_slots, booked_slots, n=None):
+        """
+        Return (order, scores): candidate indices best first, truncated to n, and all candidate scores.
+        """
+        scores = self.scores(keys, distances, predicted_available, total_slots, booked_slots)
+        order = np.argsort(scores, kind='stable')
+        if n is not None:
+            order = order[:n]
+        return order, scores
+
+    def record(self, keys):
+        """Count the given stations as recommended for the next `inflight_ttl` seconds."""
+        expiry = time.monotonic() + self.inflight_ttl
+        with self._lock:
+            for key in keys:
+                self._inflight.setdefault(key, deque()).append(expiry)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            counts = [self._expire(key, now) for key in list(self._inflight)]
+        return {
+            'stations_with_inflight': len([c for c in counts if c]),
+            'inflight_recommendations': int(sum(counts)),
+            'inflight_ttl': self.inflight_ttl
+        }
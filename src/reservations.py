@@ -0,0 +1,277 @@
+import threading
+import time
+import uuid
+import logging
+import zlib
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class SlotUnavailable(Exception):
+    """Raised when at least one interval of the requested booking is already full."""
+
+
+class ReservationNotFound(Exception):
+    pass
+
+
+class DuplicateIdempotencyKey(Exception):
+    """Raised by a slot store when a reservation with the same idempotency key already exists."""
+
+
+def interval_keys(station_id, start, end, slot_minutes=60):
+    """
+    Counter keys for every slot of [start, end), e.g. 'station:2026-01-31T14:00'.
+    """
+    if end <= start:
+        raise ValueError("Reservation end must be after start")
+    step = timedelta(minutes=slot_minutes)
+    current = start.replace(minute=start.minute - start.minute % slot_minutes, second=0, microsecond=0)
+    keys = []
+    while current < end:
+        keys.append(f"{station_id}:{current.strftime('%Y-%m-%dT%H:%M')}")
+        current += step
+    return keys
+
+
+class InMemorySlotStore:
+    """
+    Process-local slot store with the same conditional-update semantics as the
+    MongoDB store in database.py. Used for local runs and load tests.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._counters = {}
+        self._reservations = {}
+        self._by_idempotency_key = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def increment_if_below(self, key, capacity):
+        """Atomically increment the counter if it is below capacity. Returns the new count or None."""
+        self._round_trip()
+        with self._lock:
+            booked = self._counters.get(key, 0)
+            if booked >= capacity:
+                return None
+            self._counters[key] = booked + 1
+            return booked + 1
+
+    def decrement(self, key):
+        self._round_trip()
+        with self._lock:
+            self._counters[key] = max(0, self._counters.get(key, 0) - 1)
+            return self._counters[key]
+
+    def count(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def count_many(self, keys):
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def insert_reservation(self, reservation):
+        self._round_trip()
+        with self._lock:
+            key = reservation.get('idempotencyKey')
+            if key and key in self._by_idempotency_key:
+                raise DuplicateIdempotencyKey(key)
+            self._reservations[reservation['_id']] = dict(reservation)
+            if key:
+                self._by_idempotency_key[key] = reservation['_id']
+
+    def find_by_idempotency_key(self, key):
+        with self._lock:
+            reservation_id = self._by_idempotency_key.get(key)
+            return dict(self._reservations[reservation_id]) if reservation_id else None
+
+    def find_reservation(self, reservation_id):
+        with self._lock:
+            reservation = self._reservations.get(reservation_id)
+            return dict(reservation) if reservation else None
+
+    def active_reservations(self, since):
+        """Active reservations ending after `since`, for rebuilding in-memory aggregates."""
+        with self._lock:
+            return [dict(r) for r in self._reservations.values() if r['status'] == 'active' and r['end'] > since]
+
+    def mark_cancelled(self, reservation_id):
+        """Flip an active reservation to cancelled. Returns False if it was not active."""
+        self._round_trip()
+        with self._lock:
+            reservation = self._reservations.get(reservation_id)
+            if not reservation or reservation['status'] != 'active':
+                return False
+            reservation['status'] = 'cancelled'
+            reservation['cancelledAt'] = datetime.now()
+            return True
+
+
+class ReservationEngine:
+    """
+    Book and cancel hourly slots per station without overbooking.
+
+    The slot store is the authority: each interval is claimed with an atomic
+    "increment if below capacity" and claims are rolled back if any interval
+    of the booking is full. Bookings for the same station are serialized by
+    one of `n_shards` locks so concurrent requests for different stations
+    do not contend, and each station keeps an in-memory map of last observed
+    interval counts to reject obviously full slots without a store round trip.
+    """
+
+    def __init__(self, store, capacity_fn, slot_minutes=60, n_shards=64, full_cache_ttl=2.0,
+                 max_slots_per_booking=12):
+        self.store = store
+        self.capacity_fn = capacity_fn
+        self.slot_minutes = slot_minutes
+        self.full_cache_ttl = full_cache_ttl
+        self.max_slots_per_booking = max_slots_per_booking
+        self._shards = [threading.Lock() for _ in range(n_shards)]
+        # station_id -> {interval_key: (observed count, monotonic time observed)}
+        self._observed = {}
+        self._listeners = []
+        self._stats_lock = threading.Lock()
+        self._stats = {'booked': 0, 'replayed': 0, 'rejected': 0, 'cancelled': 0}
+
+    def add_listener(self, listener):
+        """Register a callable(event, reservation) called after each booking or cancellation."""
+        self._listeners.append(listener)
+
+    def _notify(self, event, reservation):
+        for listener in self._listeners:
+            try:
+                listener(event, reservation)
+            except Exception as e:
+                logger.error(f"Reservation listener failed for {event}: {str(e)}")
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _shard(self, station_id):
+        return self._shards[zlib.crc32(station_id.encode('utf-8')) % len(self._shards)]
+
+    def _observe(self, station_id, key, count):
+        """Record an interval count; called under the station's shard lock."""
+        now = time.monotonic()
+        observed = self._observed.setdefault(station_id, {})
+        # Observations only matter for full_cache_ttl, so drop expired ones as we go
+        for stale in [k for k, (_, seen_at) in observed.items() if now - seen_at >= self.full_cache_ttl]:
+            del observed[stale]
+        observed[key] = (count, now)
+
+    def _known_full(self, station_id, keys, capacity):
+        observed = self._observed.get(station_id, {})
+        now = time.monotonic()
+        for key in keys:
+            count, seen_at = observed.get(key, (0, 0.0))
+            if count >= capacity and now - seen_at < self.full_cache_ttl:
+                return True
+        return False
+
+    def reserve(self, station_id, start, end, user_id=None, idempotency_key=None):
+        """
+        Reserve one charging slot at the station for [start, end).
+        Returns (reservation, created); created is False when an idempotent retry was replayed.
+        """
+        if idempotency_key:
+            existing = self.store.find_by_idempotency_key(idempotency_key)
+            if existing:
+                self._count('replayed')
+                return existing, False
+
+        capacity = self.capacity_fn(station_id)
+        if capacity is None:
+            raise ReservationNotFound(f"Unknown station: {station_id}")
+        keys = interval_keys(station_id, start, end, self.slot_minutes)
+        if len(keys) > self.max_slots_per_booking:
+            raise ValueError(f"Bookings are limited to {self.max_slots_per_booking} slots")
+
+        with self._shard(station_id):
+            if self._known_full(station_id, keys, capacity):
+                self._count('rejected')
+                raise SlotUnavailable("Requested slot is fully booked")
+
+            claimed = []
+            for key in keys:
+                count = self.store.increment_if_below(key, capacity)
+                if count is None:
+                    self._observe(station_id, key, capacity)
+                    for claimed_key in claimed:
+                        self._observe(station_id, claimed_key, self.store.decrement(claimed_key))
+                    self._count('rejected')
+                    raise SlotUnavailable("Requested slot is fully booked")
+                claimed.append(key)
+                self._observe(station_id, key, count)
+
+            reservation = {
+                '_id': uuid.uuid4().hex,
+                'stationId': station_id,
+                'userId': user_id,
+                'start': start,
+                'end': end,
+                'intervals': keys,
+                'status': 'active',
+                'createdAt': datetime.now()
+            }
+            if idempotency_key:
+                reservation['idempotencyKey'] = idempotency_key
+            try:
+                self.store.insert_reservation(reservation)
+            except DuplicateIdempotencyKey:
+                # A concurrent retry won the race; give back our claims and replay theirs
+                for key in claimed:
+                    self._observe(station_id, key, self.store.decrement(key))
+                self._count('replayed')
+                return self.store.find_by_idempotency_key(idempotency_key), False
+
+        self._count('booked')
+        self._notify('booked', reservation)
+        return reservation, True
+
+    def cancel(self, reservation_id):
+        reservation = self.store.find_reservation(reservation_id)
+        if not reservation:
+            raise ReservationNotFound(f"Unknown reservation: {reservation_id}")
+        station_id = reservation['stationId']
+        with self._shard(station_id):
+            if not self.store.mark_cancelled(reservation_id):
+                return reservation, False
+            for key in reservation['intervals']:
+                self._observe(station_id, key, self.store.decrement(key))
+        reservation['status'] = 'cancelled'
+        self._count('cancelled')
+        self._notify('cancelled', reservation)
+        return reservation, True
+
+    def availability(self, station_id, day):
+        """Booked and free counts for every slot of the given date."""
+        capacity = self.capacity_fn(station_id)
+        if capacity is None:
+            raise ReservationNotFound(f"Unknown station: {station_id}")
+        start = datetime(day.year, day.month, day.day)
+        slots = []
+        keys = interval_keys(station_id, start, start + timedelta(days=1), self.slot_minutes)
+        for key, booked in zip(keys, self.store.count_many(keys)):
+            slots.append({
+                'slot': key.split(':', 1)[1],
+                'booked': booked,
+                'available': max(0, capacity - booked)
+            })
+        return {'capacity': capacity, 'slots': slots}
+
+    def booked_counts(self, station_ids, when):
+        """Live booked count of the slot containing `when` for each station, in one store read."""
+        keys = [interval_keys(station_id, when, when + timedelta(minutes=1), self.slot_minutes)[0]
+                for station_id in station_ids]
+        return self.store.count_many(keys)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
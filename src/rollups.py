@@ -0,0 +1,230 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from forecasting import SLOT_HOURS
+
+LEVELS = ('station', 'city', 'state', 'network')
+SLOTS = tuple(SLOT_HOURS)
+
+
+def slot_index(hour):
+    for i, (start, end) in enumerate(SLOT_HOURS.values()):
+        if start <= hour < end:
+            return i
+    return None
+
+
+def booking_hours(start, end):
+    """Start of every hour that [start, end) overlaps."""
+    current = start.replace(minute=0, second=0, microsecond=0)
+    while current < end:
+        yield current
+        current += timedelta(hours=1)
+
+
+class _LevelRollup:
+    """Aggregates for one level (e.g. every city): per-slot arrays plus an hourly booking ring."""
+
+    def __init__(self, keys, history_hours):
+        self.index = {key: i for i, key in enumerate(keys)}
+        n = len(self.index)
+        self.capacity = np.zeros(n, dtype=np.int64)
+        self.baseline = np.zeros((n, len(SLOTS)), dtype=np.int64)
+        self.live = np.zeros((n, len(SLOTS)), dtype=np.int64)
+        self.history = np.zeros((n, history_hours), dtype=np.int32) if history_hours else None
+
+
+class UtilisationRollups:
+    """
+    Incrementally maintained utilisation aggregates by station, city, state and network.
+
+    Per-slot booked counts start from the catalogue's booked slot columns (the
+    baseline) plus today's live bookings. A station's live count for a slot is
+    the most bookings it holds in any one hour of that slot, the same unit as
+    the catalogue columns, and city, state and network add up their stations.
+    Hourly counts are kept per date, so a booking made yesterday for today
+    counts today, and a cancellation of a booking that was never counted (e.g.
+    from before a restart without `seed`) is ignored rather than going negative.
+    Bookings are also counted by start hour into ring buffers covering
+    `history_hours` for city, state and network, so a dashboard read is
+    O(history window) regardless of how many stations exist. Hours that have
+    not started yet wait in a small buffer and only enter the ring once they
+    arrive, so they never evict real history.
+    """
+
+    def __init__(self, station_ids, cities, states, total_slots, slot_bookings, history_hours=24 * 30):
+        self.history_hours = int(history_hours)
+        self._station_groups = {}
+        cities = [city if isinstance(city, str) else 'Unknown' for city in cities]
+        states = [state if isinstance(state, str) else 'Unknown' for state in states]
+        for station_id, city, state in zip(station_ids, cities, states):
+            self._station_groups[station_id] = {'station': station_id, 'city': city, 'state': state, 'network': 'all'}
+
+        self._levels = {
+            'station': _LevelRollup(station_ids, 0),
+            'city': _LevelRollup(sorted(set(cities)), self.history_hours),
+            'state': _LevelRollup(sorted(set(states)), self.history_hours),
+            'network': _LevelRollup(['all'], self.history_hours)
+        }
+        # Absolute hour number held by each ring column, -1 while unused
+        self._ring_hour = np.full(self.history_hours, -1, dtype=np.int64)
+        # date -> {(station_id, hour of day): bookings}; (station_id, slot index) -> today's live peak;
+        # hour number -> {station_id: bookings}
+        self._hourly = {}
+        self._peaks = {}
+        self._upcoming = {}
+        self._live_day = datetime.now().date()
+        self._lock = threading.Lock()
+
+        total_slots = np.asarray(total_slots, dtype=np.int64)
+        booked = np.stack([np.asarray(slot_bookings[slot], dtype=np.int64) for slot in SLOTS], axis=1)
+        for level_name, level in self._levels.items():
+            rows = np.array([level.index[self._station_groups[sid][level_name]] for sid in station_ids], dtype=np.int64)
+            np.add.at(level.capacity, rows, total_slots)
+            np.add.at(level.baseline, rows, booked)
+
+    def _rows(self, station_id):
+        groups = self._station_groups.get(station_id)
+        if groups is None:
+            return None
+        return [(level, level.index[groups[name]]) for name, level in self._levels.items()]
+
+    def _roll_day(self, now):
+        today = now.date()
+        if today == self._live_day:
+            return
+        for level in self._levels.values():
+            level.live[:] = 0
+        self._peaks.clear()
+        for day in [day for day in self._hourly if day < today]:
+            del self._hourly[day]
+        self._live_day = today
+        for station_id, slot in {(station_id, slot_index(hour)) for station_id, hour in self._hourly.get(today, {})}:
+            self._update_peak(station_id, slot)
+
+    def _update_peak(self, station_id, slot):
+        """Recompute a station's busiest hour in a slot of the live day and apply the change."""
+        counts = self._hourly.get(self._live_day, {})
+        start, end = SLOT_HOURS[SLOTS[slot]]
+        peak = max(counts.get((station_id, hour), 0) for hour in range(start, end))
+        change = peak - self._peaks.get((station_id, slot), 0)
+        if not change:
+            return
+        if peak:
+            self._peaks[(station_id, slot)] = peak
+        else:
+            self._peaks.pop((station_id, slot), None)
+        for level, row in self._rows(station_id):
+            level.live[row, slot] += change
+
+    def _ring_column(self, hour_number):
+        column = hour_number % self.history_hours
+        if self._ring_hour[column] != hour_number:
+            if self._ring_hour[column] > hour_number:
+                return None  # Older than the history window
+            for level in self._levels.values():
+                if level.history is not None:
+                    level.history[:, column] = 0
+            self._ring_hour[column] = hour_number
+        return column
+
+    def _add_history(self, station_id, hour_number, delta):
+        column = self._ring_column(hour_number)
+        if column is None:
+            return
+        for level, row in self._rows(station_id):
+            if level.history is not None:
+                level.history[row, column] = max(0, level.history[row, column] + delta)
+
+    def _promote(self, current_hour):
+        """Move buffered bookings whose hour has arrived into the ring."""
+        for hour_number in sorted(h for h in self._upcoming if h <= current_hour):
+            for station_id, count in self._upcoming.pop(hour_number).items():
+                self._add_history(station_id, hour_number, count)
+
+    def record(self, station_id, start, end, delta=1):
+        """Apply a booking (delta=1) or cancellation (delta=-1) of [start, end)."""
+        if self._rows(station_id) is None:
+            return
+        now = datetime.now()
+        hour_number = int(start.timestamp() // 3600)
+        current_hour = int(now.timestamp() // 3600)
+        with self._lock:
+            self._roll_day(now)
+            live_slots = set()
+            for hour in booking_hours(start, end):
+                slot = slot_index(hour.hour)
+                if slot is None or hour.date() < self._live_day:
+                    continue
+                counts = self._hourly.setdefault(hour.date(), {})
+                count = counts.get((station_id, hour.hour), 0) + delta
+                if count < 0:
+                    continue  # Cancelling a booking that was never counted
+                if count:
+                    counts[(station_id, hour.hour)] = count
+                else:
+                    counts.pop((station_id, hour.hour), None)
+                if hour.date() == self._live_day:
+                    live_slots.add(slot)
+            for slot in live_slots:
+                self._update_peak(station_id, slot)
+            if self.history_hours:
+                self._promote(current_hour)
+                if hour_number > current_hour:
+                    bookings = self._upcoming.setdefault(hour_number, {})
+                    count = bookings.get(station_id, 0) + delta
+                    if count > 0:
+                        bookings[station_id] = count
+                    else:
+                        bookings.pop(station_id, None)
+                else:
+                    self._add_history(station_id, hour_number, delta)
+
+    def seed(self, reservations):
+        """Count stored active reservations, e.g. at startup, so later cancellations find them."""
+        for reservation in reservations:
+            self.record(reservation['stationId'], reservation['start'], reservation['end'])
+
+    def summary(self, level_name, key, hours=24):
+        """
+        Precomputed utilisation for one station/city/state (or the network),
+        with per-hour booking counts for the last `hours` hours where kept.
+        """
+        level = self._levels.get(level_name)
+        if level is None:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        row = level.index.get(key)
+        if row is None:
+            return None
+        now = datetime.now()
+        with self._lock:
+            self._roll_day(now)
+            if self.history_hours:
+                self._promote(int(now.timestamp() // 3600))
+            capacity = int(level.capacity[row])
+            booked = level.baseline[row] + level.live[row]
+            slots = {
+                slot: {
+                    'booked': int(booked[i]),
+                    'capacity': capacity,
+                    'utilisation': round(float(booked[i]) / capacity, 3) if capacity else None
+                }
+                for i, slot in enumerate(SLOTS)
+            }
+            history = None
+            if level.history is not None and hours > 0:
+                hours = min(int(hours), self.history_hours)
+                current = int(now.timestamp() // 3600)
+                numbers = np.arange(current - hours + 1, current + 1)
+                columns = numbers % self.history_hours
+                valid = self._ring_hour[columns] == numbers
+                history = np.where(valid, level.history[row, columns], 0).tolist()
+        return {
+            'level': level_name,
+            'key': key,
+            'totalSlots': capacity,
+            'slots': slots,
+            'hourlyBookings': history
+        }
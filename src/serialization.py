@@ -0,0 +1,103 @@
+import gzip
+import json
+import logging
+
+from flask import Response
+
+logger = logging.getLogger(__name__)
+
+# Optional fast paths; fall back to the standard library when not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+COLUMNAR_MIMETYPE = 'application/vnd.evoya.columnar+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_THRESHOLD = 1024
+
+
+def dumps(obj):
+    """Encode to UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+def to_columnar(records):
+    """
+    Convert a list of dicts into {"count", "constants", "columns"}.
+    Fields with the same value in every record are sent once under "constants".
+    """
+    if not records:
+        return {"count": 0, "constants": {}, "columns": {}}
+    fields = list(records[0].keys())
+    constants, columns = {}, {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        first = values[0]
+        if len(values) > 1 and all(value == first for value in values[1:]):
+            constants[field] = first
+        else:
+            columns[field] = values
+    return {"count": len(records), "constants": constants, "columns": columns}
+
+
+def negotiate_format(accept_header):
+    """Pick the response mimetype from an Accept header, defaulting to plain JSON."""
+    accept = (accept_header or '').lower()
+    if MSGPACK_MIMETYPE in accept or 'application/x-msgpack' in accept:
+        if msgpack is not None:
+            return MSGPACK_MIMETYPE
+        logger.debug("msgpack requested but not installed, falling back")
+    if COLUMNAR_MIMETYPE in accept:
+        return COLUMNAR_MIMETYPE
+    return JSON_MIMETYPE
+
+
+def negotiate_encoding(accept_encoding):
+    encodings = {part.split(';')[0].strip() for part in (accept_encoding or '').lower().split(',')}
+    if 'br' in encodings and brotli is not None:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def station_list_response(records, req, status=200):
+    """
+    Serialize a list of station dicts in the format and encoding the client asked for.
+    """
+    mimetype = negotiate_format(req.headers.get('Accept'))
+    if mimetype == MSGPACK_MIMETYPE:
+        body = msgpack.packb(to_columnar(records), use_bin_type=True)
+    elif mimetype == COLUMNAR_MIMETYPE:
+        body = dumps(to_columnar(records))
+    else:
+        body = dumps(records)
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+
+    if len(body) >= COMPRESSION_THRESHOLD:
+        encoding = negotiate_encoding(req.headers.get('Accept-Encoding'))
+        if encoding == 'br':
+            response.set_data(brotli.compress(body, quality=5))
+        elif encoding == 'gzip':
+            response.set_data(gzip.compress(body, compresslevel=5))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    return response
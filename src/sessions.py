@@ -0,0 +1,83 @@
+import threading
+import logging
+from collections import OrderedDict
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = 'evoya_session'
+
+
+class SessionManager:
+    """
+    Signed, expiring session tokens. Verification only checks the signature,
+    so resolving who is calling needs no database lookup.
+    """
+
+    def __init__(self, secret_key, max_age=7 * 24 * 3600):
+        self.serializer = URLSafeTimedSerializer(secret_key, salt='evoya-session')
+        self.max_age = max_age
+
+    def issue(self, user):
+        return self.serializer.dumps({
+            "uid": str(user["_id"]),
+            "userType": user.get("userType"),
+            "name": user.get("name")
+        })
+
+    def verify(self, token):
+        if not token:
+            return None
+        try:
+            return self.serializer.loads(token, max_age=self.max_age)
+        except SignatureExpired:
+            logger.debug("Session token expired")
+        except BadSignature:
+            logger.debug("Invalid session token")
+        return None
+
+    def from_request(self, req):
+        """Session payload from the Authorization bearer token or the session cookie."""
+        auth = req.headers.get('Authorization', '')
+        token = auth[7:] if auth.startswith('Bearer ') else req.cookies.get(SESSION_COOKIE)
+        return self.verify(token)
+
+
+class ProfileCache:
+    """
+    Bounded LRU of user profiles keyed by user id. `loader(user_id)` is only
+    called on a miss; call `invalidate` whenever a profile is updated.
+    """
+
+    def __init__(self, loader, max_entries=10000):
+        self.loader = loader
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            profile = self._entries.get(user_id)
+            if profile is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return profile
+            self.misses += 1
+        profile = self.loader(user_id)
+        if profile is not None:
+            with self._lock:
+                self._entries[user_id] = profile
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,225 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from flask import Flask, request, jsonify
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'Models2', 'Models2')))
+from station_recommender import ChargingStationRecommender
+from haversine import haversine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Models2', 'Models2', 'balanced_dataset.csv')
+
+
+# Per-station columns the API process keeps (forecasts, clusters, rollups, capacity);
+# names, addresses and the rest of the table stay on the shard nodes
+CATALOGUE_COLUMNS = ['station_id', 'lattitude', 'longitude', 'city', 'state', 'Total_Slots',
+                     '6AM-11AM_Booked_slots', '11AM-4PM_Booked_slots', '4PM-10PM_Booked_slots']
+
+
+def partition_sizes(data_path, key='state', chunksize=100000):
+    """Station count per partition, streaming only the partition column."""
+    sizes = pd.Series(dtype=np.int64)
+    for chunk in pd.read_csv(data_path, usecols=[key], chunksize=chunksize):
+        sizes = sizes.add(chunk[key].fillna('Unknown').value_counts(), fill_value=0)
+    return sizes.astype(np.int64).sort_values(ascending=False, kind='stable')
+
+
+def assign_partitions(sizes, n_nodes):
+    """
+    Spread partitions (states) over nodes, largest first onto the least loaded node.
+    `sizes` maps partition to station count. Returns a list of partition lists, one per node.
+    """
+    nodes = [[] for _ in range(n_nodes)]
+    load = [0] * n_nodes
+    for partition, size in sizes.items():
+        target = load.index(min(load))
+        nodes[target].append(partition)
+        load[target] += int(size)
+    return nodes
+
+
+def load_partitions(data_path, partitions, key='state', chunksize=100000):
+    """Read only the rows of the given partitions, one chunk of the CSV at a time."""
+    wanted = set(partitions)
+    parts = [chunk[chunk[key].fillna('Unknown').isin(wanted)]
+             for chunk in pd.read_csv(data_path, chunksize=chunksize)]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def bbox_distance(lat, lng, bounds):
+    """
+    Distance (km) from a point to the closest point of a lat/lng bounding box,
+    used as a lower bound on the distance to any station inside it.
+    """
+    south, west, north, east = bounds
+    return float(haversine(lat, lng, min(max(lat, south), north), min(max(lng, west), east)))
+
+
+def create_node_app(data_path, partitions, key='state'):
+    """
+    Flask app serving nearest-station queries for the given partitions of the catalogue.
+    """
+    # Station IDs only depend on name and coordinates (exact duplicates share a
+    # state, so their suffixes match too), so a partition yields catalogue IDs
+    recommender = ChargingStationRecommender(df=load_partitions(data_path, partitions, key))
+
+    bounds = {}
+    partition_rows = {}
+    for partition, group in recommender.df.groupby(recommender.df[key].fillna('Unknown')):
+        bounds[partition] = [float(group['lattitude'].min()), float(group['longitude'].min()),
+                             float(group['lattitude'].max()), float(group['longitude'].max())]
+        partition_rows[partition] = recommender.df.index.get_indexer(group.index)
+    logger.info(f"Shard node owns {len(recommender.df)} stations in {len(bounds)} partitions")
+
+    node = Flask(__name__)
+
+    @node.route('/shard/partitions', methods=['GET'])
+    def get_partitions():
+        return jsonify({"partitions": bounds, "stations": len(recommender.df)}), 200
+
+    @node.route('/shard/stations', methods=['GET'])
+    def shard_stations():
+        index = recommender.df.assign(station_id=recommender.station_ids())[CATALOGUE_COLUMNS]
+        index = index.astype(object).where(index.notna(), None)
+        return jsonify({column: index[column].tolist() for column in CATALOGUE_COLUMNS}), 200
+
+    @node.route('/shard/nearest', methods=['POST'])
+    def shard_nearest():
+        data = request.get_json()
+        lat, lng, n = float(data['lat']), float(data['lng']), int(data.get('n', 6))
+        wanted = data.get('partitions')
+        if wanted and set(wanted) != set(bounds):
+            # Only search the partitions the coordinator could not prune
+            rows = [partition_rows[p] for p in wanted if p in partition_rows]
+            rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+            candidates = recommender.find_nearest(lat, lng, n=n, rows=rows)
+        else:
+            candidates = recommender.find_nearest(lat, lng, n=n)
+        records = candidates.replace({np.nan: None}).to_dict('records')
+        return jsonify({"stations": records}), 200
+
+    return node
+
+
+class ShardCoordinator:
+    """
+    Scatter-gather nearest-station queries over shard nodes.
+
+    Partitions are visited in order of their bounding-box distance from the
+    query point; a partition is only queried while its lower-bound distance
+    could still beat the current k-th best result.
+    Returns DataFrames shaped like ChargingStationRecommender.find_nearest.
+    """
+
+    def __init__(self, node_urls, timeout=2.0):
+        self.timeout = timeout
+        self.partitions = []
+        for url in node_urls:
+            info = self._call(url, '/shard/partitions')
+            for partition, bounds in info['partitions'].items():
+                self.partitions.append((partition, url.rstrip('/'), bounds))
+        logger.info(f"Coordinator discovered {len(self.partitions)} partitions on {len(node_urls)} nodes")
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(node_urls)))
+
+    def _call(self, url, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(url.rstrip('/') + path, data=data,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def station_index(self):
+        """CATALOGUE_COLUMNS for every station, gathered from the nodes."""
+        urls = sorted({url for _, url, _ in self.partitions})
+        frames = [pd.DataFrame(self._call(url, '/shard/stations')) for url in urls]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CATALOGUE_COLUMNS)
+
+    def _scatter(self, lat, lng, n, partitions):
+        by_node = {}
+        for partition, url, _ in partitions:
+            by_node.setdefault(url, []).append(partition)
+        futures = [
+            self._pool.submit(self._call, url, '/shard/nearest',
+                              {"lat": lat, "lng": lng, "n": n, "partitions": names})
+            for url, names in by_node.items()
+        ]
+        results = []
+        for future in futures:
+            results += future.result()['stations']
+        return results
+
+    def find_nearest(self, user_lat, user_lon, n=6):
+        if not (-90 <= user_lat <= 90) or not (-180 <= user_lon <= 180):
+            raise ValueError("Invalid latitude or longitude values")
+        ranked = sorted(self.partitions, key=lambda p: bbox_distance(user_lat, user_lon, p[2]))
+        bounds = [bbox_distance(user_lat, user_lon, p[2]) for p in ranked]
+
+        # First wave: the closest partition and any others with the same lower bound
+        wave_end = 1
+        while wave_end < len(ranked) and bounds[wave_end] <= bounds[0]:
+            wave_end += 1
+        stations = self._scatter(user_lat, user_lon, n, ranked[:wave_end])
+
+        # Second wave: every remaining partition that could still contain a top-n station
+        kth = sorted(s['distance'] for s in stations)[n - 1] if len(stations) >= n else float('inf')
+        remaining = [p for p, bound in zip(ranked[wave_end:], bounds[wave_end:]) if bound < kth]
+        if remaining:
+            stations += self._scatter(user_lat, user_lon, n, remaining)
+
+        result = pd.DataFrame(stations)
+        if result.empty:
+            return result
+        return result.sort_values('distance', kind='stable').head(n).reset_index(drop=True)
+
+
+def launch_local(n_nodes, base_port, data_path):
+    """
+    Start n_nodes shard processes on this machine and return (processes, urls).
+    """
+    processes, urls = [], []
+    for i, partitions in enumerate(assign_partitions(partition_sizes(data_path), n_nodes)):
+        port = base_port + i
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), 'node',
+            '--port', str(port), '--data', data_path, '--partitions', json.dumps(partitions)
+        ]))
+        urls.append(f"http://localhost:{port}")
+    return processes, urls
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Partitioned station catalogue")
+    sub = parser.add_subparsers(dest='command', required=True)
+    node_parser = sub.add_parser('node', help="Serve a set of partitions")
+    node_parser.add_argument('--port', type=int, required=True)
+    node_parser.add_argument('--data', default=DEFAULT_DATASET)
+    node_parser.add_argument('--partitions', required=True, help="JSON list of state names")
+    local_parser = sub.add_parser('local', help="Run several nodes on this machine")
+    local_parser.add_argument('--nodes', type=int, default=3)
+    local_parser.add_argument('--base-port', type=int, default=5101)
+    local_parser.add_argument('--data', default=DEFAULT_DATASET)
+    args = parser.parse_args()
+
+    if args.command == 'node':
+        create_node_app(args.data, json.loads(args.partitions)).run(host='0.0.0.0', port=args.port)
+    else:
+        procs, node_urls = launch_local(args.nodes, args.base_port, args.data)
+        print("Shard nodes started. Run the API with:")
+        print(f"  EVOYA_SHARD_NODES={','.join(node_urls)} python app.py")
+        try:
+            for proc in procs:
+                proc.wait()
+        except KeyboardInterrupt:
+            for proc in procs:
+                proc.terminate()